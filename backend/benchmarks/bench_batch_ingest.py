@@ -0,0 +1,82 @@
+# bench_batch_ingest.py
+# Compares rows/sec of the single-item save path with the batch ingestion path against the MySQL /
+# MariaDB database configured in .env (load database/hcp.sql first). Rows it writes are deleted again and their
+# engagement rollup counts subtracted.
+# Run from the backend directory:  python -m benchmarks.bench_batch_ingest --logs 5000
+import argparse
+import random
+import time
+import uuid
+from collections import Counter
+
+import main
+from main import InteractionLogCreate
+
+def synthetic_logs(rng: random.Random, count: int, run_tag: str):
+    products = ["OncoBoost", "PulmoClear", "CardioSure", "NeuroCalm"]
+    for i in range(count):
+        yield InteractionLogCreate(
+            hcpName=f"Dr. Bench {rng.randint(1, 5000)}", interactionType=rng.choice(["Meeting", "Virtual Call", "Email"]),
+            date="2025-05-20", time="09:30", topicsDiscussed="Efficacy data and dosing", sentiment=rng.choice(["Positive", "Neutral", "Negative"]),
+            outcomes="Agreed to review data", followUpActions="Follow up in 2 weeks", chatSessionId=run_tag,
+            materialsShared=[{"id": 1, "name": "Phase III PDF"}], samplesDistributed=[{"id": 1, "name": rng.choice(products)}],
+            productsDiscussed=rng.sample(products, 2), idempotencyKey=f"{run_tag}-{i}",
+        )
+
+def cleanup(run_tag: str):
+    """Deletes the run's logs and takes their counts back out of interaction_rollups in the same transaction."""
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, hcpName, interactionDate, sentiment FROM interaction_logs WHERE chatSessionId = %s", (run_tag,))
+    logs, removed = cursor.fetchall(), Counter()
+    for offset in range(0, len(logs), main.BATCH_CHUNK_SIZE):
+        chunk = logs[offset:offset + main.BATCH_CHUNK_SIZE]
+        ids = [row[0] for row in chunk]
+        cursor.execute(f"SELECT interaction_log_id, product_name FROM interaction_products_discussed_ai WHERE interaction_log_id IN ({', '.join(['%s'] * len(ids))})", ids)
+        products = {}
+        for log_id, product_name in cursor.fetchall(): products.setdefault(log_id, []).append(product_name)
+        for log_id, hcp_name, interaction_date, sentiment in chunk:
+            removed.update(main.rollup_keys(hcp_name, interaction_date, sentiment, products.get(log_id)))
+    items = list(removed.items())
+    for offset in range(0, len(items), main.BATCH_CHUNK_SIZE):
+        main.apply_rollup_delta(cursor, Counter({key: -count for key, count in items[offset:offset + main.BATCH_CHUNK_SIZE]}))
+    cursor.execute("DELETE FROM interaction_logs WHERE chatSessionId = %s", (run_tag,))  # children cascade
+    conn.commit(); cursor.close(); conn.close()
+
+def rows_written(logs) -> int:
+    return sum(1 + len(log.materialsShared) + len(log.samplesDistributed) + len(log.productsDiscussed) for log in logs)
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=5000, help="logs written through the batch path")
+    parser.add_argument("--single-logs", type=int, default=500, help="logs written through the single-item path")
+    parser.add_argument("--chunk-size", type=int, default=main.BATCH_CHUNK_SIZE)
+    args = parser.parse_args()
+    if main.init_db_pool() is None: raise SystemExit("Database not reachable; check the .env settings.")
+    rng = random.Random(11)
+    run_tag = f"bench_batch_{uuid.uuid4().hex[:8]}"
+    try:
+        single_logs = list(synthetic_logs(rng, args.single_logs, run_tag + "s"))
+        started = time.perf_counter()
+        for log in single_logs: main.save_interaction_log(log)
+        single_rate = rows_written(single_logs) / (time.perf_counter() - started)
+
+        batch_logs = list(synthetic_logs(rng, args.logs, run_tag + "b"))
+        started = time.perf_counter()
+        for offset in range(0, len(batch_logs), args.chunk_size):
+            main.write_interaction_batch(list(enumerate(batch_logs[offset:offset + args.chunk_size], start=offset)))
+        batch_rate = rows_written(batch_logs) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        retried = main.write_interaction_batch(list(enumerate(batch_logs[:args.chunk_size])))
+        assert all(r.status == "duplicate" for r in retried), "retried chunk should be reported as duplicates"
+        print(f"single-item path: {single_rate:10.0f} rows/s ({args.single_logs} logs)")
+        print(f"batch path:       {batch_rate:10.0f} rows/s ({args.logs} logs, chunk {args.chunk_size})")
+        print(f"speed-up:         {batch_rate / single_rate:10.1f}x")
+        print(f"retried chunk:    {len(retried)} duplicates detected in {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        cleanup(run_tag + "s"); cleanup(run_tag + "b")
+        main.close_db_pool()
+
+if __name__ == "__main__":
+    main_()
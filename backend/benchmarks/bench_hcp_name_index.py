@@ -0,0 +1,87 @@
+# bench_hcp_name_index.py
+# Loads synthetic HCPs into TrigramNameIndex and reports fuzzy lookup latency percentiles.
+# Run from the backend directory:  python -m benchmarks.bench_hcp_name_index --count 500000
+import argparse
+import random
+import string
+import time
+
+from main import HCP_MATCH_MIN_SCORE, TrigramNameIndex
+
+FIRST_NAMES = ["Evelyn", "Marcus", "Priya", "Oliver", "Amelia", "Hiro", "Fatima", "Lucas", "Sofia", "Noah", "Chloe", "Mateo",
+               "Aisha", "Liam", "Grace", "Ravi", "Elena", "Samuel", "Mei", "Daniel", "Nora", "Ibrahim", "Clara", "Jonas"]
+ONSETS = ["b", "br", "c", "ch", "d", "f", "g", "gr", "h", "j", "k", "kr", "l", "m", "n", "p", "r", "s", "sh", "st", "t", "th", "v", "w", "y", "z"]
+VOWELS = ["a", "e", "i", "o", "u", "ai", "ea", "ie", "ou", "y"]
+CODAS = ["", "", "n", "r", "s", "t", "l", "m", "ck", "ng", "rd", "son", "ton", "man", "ez", "ski"]
+
+def synthetic_surname(rng: random.Random) -> str:
+    syllables = [rng.choice(ONSETS) + rng.choice(VOWELS) for _ in range(rng.randint(1, 3))]
+    return ("".join(syllables) + rng.choice(CODAS)).capitalize()
+
+def with_typo(rng: random.Random, word: str) -> str:
+    pos = rng.randrange(1, len(word))
+    return word[:pos] + rng.choice(string.ascii_lowercase) + word[pos + 1:]
+
+def percentile(sorted_values, pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+def count_accept(counts, index: TrigramNameIndex, query: str, is_right) -> None:
+    results = index.search(query, limit=1, require_all_tokens=True)
+    counts[0] += 1
+    if results and results[0][2] >= HCP_MATCH_MIN_SCORE:
+        counts[1] += 1
+        counts[2] += not is_right(results[0][1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500_000, help="number of synthetic HCPs")
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    surnames = [synthetic_surname(rng) for _ in range(max(args.count // 4, 1))]
+    hcps = [(i, f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(surnames)}") for i in range(1, args.count + 1)]
+
+    index = TrigramNameIndex()
+    started = time.perf_counter()
+    for hcp_id, name in hcps: index.upsert(hcp_id, name)
+    build_s = time.perf_counter() - started
+
+    timings_us, found = [], 0
+    # [queries, accepted, accepted but the top hit is not the queried HCP]; acceptance is what the HCP profile tool does.
+    accepted = {"surname only": [0, 0, 0], "with first name": [0, 0, 0], "absent HCP": [0, 0, 0]}
+    known = set(surnames)
+    for _ in range(args.queries):
+        hcp_id, name = rng.choice(hcps)
+        first, last = name.split()[1:]
+        kind = "with first name" if rng.random() < 0.5 else "surname only"
+        query = f"Dr {first} {with_typo(rng, last)}" if kind == "with first name" else f"Dr {with_typo(rng, last)}"
+        started = time.perf_counter_ns()
+        results = index.search(query, limit=5)
+        timings_us.append((time.perf_counter_ns() - started) / 1000)
+        found += any(result_name.split()[-1] == last for _, result_name, _ in results)
+        count_accept(accepted[kind], index, query, lambda top: top == name if kind == "with first name" else top.split()[-1] == last)
+
+        absent = synthetic_surname(rng)
+        while absent in known: absent = synthetic_surname(rng)
+        count_accept(accepted["absent HCP"], index, f"Dr {first} {absent}" if rng.random() < 0.5 else f"Dr {absent}", lambda top: False)
+    timings_us.sort()
+
+    print(f"HCPs indexed:        {len(index):,} ({len(index._token_postings):,} distinct tokens), build {build_s:.2f}s")
+    print(f"Lookups:             {args.queries:,} (typo in surname, half with first name)")
+    print(f"Surname recall@5:    {found / args.queries:.1%}")
+    print(f"Absent-HCP lookups:  {args.queries:,} (known first name or none, unseen surname)")
+    for kind, (total, ok, wrong) in accepted.items():
+        print(f"{kind + ':':<21}accepted {ok / max(total, 1):6.1%}, false accepts {wrong / max(total, 1):6.1%} (top score >= {HCP_MATCH_MIN_SCORE})")
+    for pct in (50, 95, 99):
+        print(f"p{pct} latency:         {percentile(timings_us, pct):8.1f} us")
+    print(f"max latency:         {timings_us[-1]:8.1f} us")
+    try:
+        import resource  # not available on Windows
+        print(f"process max RSS:     {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.1f} MB")
+    except ImportError:
+        pass
+
+if __name__ == "__main__":
+    main()
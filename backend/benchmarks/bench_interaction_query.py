@@ -0,0 +1,58 @@
+# bench_interaction_query.py
+# Latency of the paginated /interactions query path (first pages and deep keyset pages) against the
+# MySQL / MariaDB database configured in .env (load database/hcp.sql first). With --seed N it first bulk
+# loads N synthetic logs through the batch path and deletes them again afterwards; use an existing large
+# table otherwise. Run from the backend directory:  python -m benchmarks.bench_interaction_query --seed 200000
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+import main
+from benchmarks.bench_batch_ingest import cleanup, synthetic_logs
+
+def random_filters(rng: random.Random) -> dict:
+    filters = {}
+    if rng.random() < 0.5: filters["hcp"] = f"Dr. Bench {rng.randint(1, 5000)}"
+    if rng.random() < 0.3: filters["sentiment"] = rng.choice(["Positive", "Neutral", "Negative"])
+    if rng.random() < 0.3: filters["product"] = rng.choice(["OncoBoost", "PulmoClear", "CardioSure", "NeuroCalm"])
+    if rng.random() < 0.2: filters["interaction_type"] = rng.choice(["Meeting", "Virtual Call", "Email"])
+    return filters
+
+def percentile(samples, pct: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(pct) - 1] if len(samples) > 1 else samples[0]
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="synthetic logs to load before measuring (deleted afterwards)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=5, help="pages followed per query to measure deep keyset pages")
+    parser.add_argument("--limit", type=int, default=main.QUERY_PAGE_DEFAULT)
+    args = parser.parse_args()
+    if main.init_db_pool() is None: raise SystemExit("Database not reachable; check the .env settings.")
+    rng = random.Random(7)
+    run_tag = f"bench_query_{uuid.uuid4().hex[:8]}"
+    try:
+        if args.seed:
+            logs = list(synthetic_logs(rng, args.seed, run_tag))
+            for offset in range(0, len(logs), main.BATCH_CHUNK_SIZE):
+                main.write_interaction_batch(list(enumerate(logs[offset:offset + main.BATCH_CHUNK_SIZE], start=offset)))
+        first_page, later_pages = [], []
+        for _ in range(args.queries):
+            filters, cursor_token = random_filters(rng), None
+            for page in range(args.pages):
+                started = time.perf_counter()
+                result = main.query_interaction_logs(**filters, limit=args.limit, cursor_token=cursor_token)
+                (first_page if page == 0 else later_pages).append((time.perf_counter() - started) * 1000)
+                cursor_token = result.next_cursor
+                if not cursor_token: break
+        for label, samples in (("first page", first_page), ("later pages", later_pages)):
+            if not samples: continue
+            print(f"{label:12s} n={len(samples):6d}  p50={percentile(samples, 50):7.2f} ms  p95={percentile(samples, 95):7.2f} ms  p99={percentile(samples, 99):7.2f} ms")
+    finally:
+        if args.seed: cleanup(run_tag)
+        main.close_db_pool()
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,205 @@
+# db_fixture.py
+# Disposable databases loaded from database/hcp.sql for the benchmarks.
+#   SQLiteFixture - no server needed: translates the phpMyAdmin dump to SQLite in a temp directory and swaps
+#                   main.get_db_connection for connections that behave like mysql-connector's (%s params,
+#                   dictionary cursors, TIME columns as timedelta, MySQL error classes). FULLTEXT search is
+#                   not available.
+#   MySQLFixture  - creates a throwaway database next to the one configured in .env (the DB_USER needs
+#                   CREATE/DROP privileges), loads the dump into it and points main at it; dropped on exit.
+# Both are context managers:  with SQLiteFixture() as db: db.install(main)
+import datetime
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+from mysql.connector import errors as mysql_errors
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "database" / "hcp.sql"
+
+def dump_statements(sql_text: str) -> List[str]:
+    """Splits a MySQL dump into statements, dropping comments and respecting quoted strings."""
+    statements, current, quote, i = [], [], None, 0
+    while i < len(sql_text):
+        ch = sql_text[i]
+        if quote:
+            current.append(ch)
+            if ch == "\\": current.append(sql_text[i + 1]); i += 1
+            elif ch == quote: quote = None
+        elif ch in "'`\"": quote = ch; current.append(ch)
+        elif sql_text.startswith("--", i) or sql_text.startswith("/*", i):
+            end = sql_text.find("\n" if ch == "-" else "*/", i)
+            i = len(sql_text) if end < 0 else end + (0 if ch == "-" else 2)
+            continue
+        elif ch == ";":
+            statement = "".join(current).strip()
+            if statement: statements.append(statement)
+            current = []
+        else: current.append(ch)
+        i += 1
+    if "".join(current).strip(): statements.append("".join(current).strip())
+    return statements
+
+# --- SQLite ---
+def _quoted(text: str) -> List[str]:
+    return re.findall(r"`([^`]+)`", text)
+
+def sqlite_statements(statements: List[str]) -> List[str]:
+    """Translates the dump's CREATE TABLE / ALTER TABLE / INSERT statements into SQLite DDL and DML."""
+    columns: Dict[str, List[str]] = {}
+    tables: Dict[str, dict] = {}
+    inserts, order = [], []
+    for statement in statements:
+        head = statement.split(None, 2)[:2]
+        if head == ["CREATE", "TABLE"]:
+            table = _quoted(statement)[0]
+            body = statement[statement.index("(") + 1:statement.rindex(")")]
+            columns[table] = [re.sub(r"\s+ON UPDATE current_timestamp\(\)", "", line.strip().rstrip(","))
+                              .replace("current_timestamp()", "CURRENT_TIMESTAMP") for line in body.splitlines() if line.strip()]
+            tables[table] = {"primary": [], "indexes": [], "foreign": [], "autoincrement": None}
+            order.append(table)
+        elif head == ["ALTER", "TABLE"]:
+            table = _quoted(statement)[0]
+            for clause in re.split(r",\s*\n\s*", statement.split("\n", 1)[1]):
+                clause = clause.strip()
+                if clause.startswith("ADD PRIMARY KEY"): tables[table]["primary"] = _quoted(clause)
+                elif clause.startswith(("ADD KEY", "ADD UNIQUE KEY")):
+                    name, *cols = _quoted(clause)
+                    tables[table]["indexes"].append((name, cols, "UNIQUE" in clause))
+                elif clause.startswith("ADD CONSTRAINT"):
+                    _, column, ref_table, ref_column = _quoted(clause)
+                    tables[table]["foreign"].append(f"FOREIGN KEY (`{column}`) REFERENCES `{ref_table}` (`{ref_column}`) ON DELETE CASCADE")
+                elif clause.startswith("MODIFY") and "AUTO_INCREMENT" in clause: tables[table]["autoincrement"] = _quoted(clause)[0]
+                # FULLTEXT keys have no SQLite equivalent and are skipped.
+        elif head[0] == "INSERT":
+            inserts.append(statement.replace("\\'", "''"))
+    ddl = []
+    for table in order:
+        meta, defs = tables[table], list(columns[table])
+        if meta["autoincrement"] and meta["primary"] == [meta["autoincrement"]]:
+            defs = [f"`{meta['autoincrement']}` INTEGER PRIMARY KEY AUTOINCREMENT" if _quoted(d)[:1] == [meta["autoincrement"]] else d for d in defs]
+        elif meta["primary"]:
+            defs.append("PRIMARY KEY (" + ", ".join(f"`{c}`" for c in meta["primary"]) + ")")
+        ddl.append(f"CREATE TABLE `{table}` (\n  " + ",\n  ".join(defs + meta["foreign"]) + "\n)")
+        ddl.extend(f"CREATE {'UNIQUE ' if unique else ''}INDEX `{table}_{name}` ON `{table}` (" + ", ".join(f"`{c}`" for c in cols) + ")"
+                   for name, cols, unique in meta["indexes"])
+    return ddl + inserts
+
+def _time_to_timedelta(raw: bytes) -> datetime.timedelta:
+    hours, minutes, seconds = raw.decode().split(":")
+    return datetime.timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.time, lambda value: value.isoformat())
+sqlite3.register_converter("date", lambda raw: datetime.date.fromisoformat(raw.decode()))
+sqlite3.register_converter("time", _time_to_timedelta)
+sqlite3.register_converter("timestamp", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+
+def translate_mysql(sql: str) -> str:
+    sql = sql.replace("%s", "?").replace(" FOR UPDATE", "")
+    if "ON DUPLICATE KEY UPDATE" in sql:
+        sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+    return sql
+
+def _mysql_error(e: sqlite3.Error) -> mysql_errors.Error:
+    error_class = mysql_errors.IntegrityError if isinstance(e, sqlite3.IntegrityError) else mysql_errors.DatabaseError
+    return error_class(msg=str(e), errno=1062 if isinstance(e, sqlite3.IntegrityError) else 1105)
+
+class SQLiteCursor:
+    def __init__(self, connection: sqlite3.Connection, dictionary: bool):
+        self._cursor, self._dictionary = connection.cursor(), dictionary
+
+    def execute(self, sql: str, params=()):
+        try: self._cursor.execute(translate_mysql(sql), tuple(params or ()))
+        except sqlite3.Error as e: raise _mysql_error(e) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary: return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def fetchone(self): return self._row(self._cursor.fetchone())
+    def fetchall(self): return [self._row(row) for row in self._cursor.fetchall()]
+    @property
+    def rowcount(self): return self._cursor.rowcount
+    @property
+    def lastrowid(self): return self._cursor.lastrowid
+    def close(self): self._cursor.close()
+
+class SQLiteConnection:
+    """The subset of mysql-connector's connection API that main.py uses."""
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._open = True
+
+    def cursor(self, dictionary: bool = False, **_): return SQLiteCursor(self._connection, dictionary)
+    def commit(self): self._connection.commit()
+    def rollback(self): self._connection.rollback()
+    def is_connected(self) -> bool: return self._open
+    def ping(self, **_): pass
+    def close(self):
+        if self._open: self._connection.close(); self._open = False
+
+class SQLiteFixture:
+    def __init__(self, schema_path: Path = SCHEMA_PATH):
+        self.schema_path = schema_path
+        self.directory = tempfile.mkdtemp(prefix="hcp_bench_")
+        self.path = str(Path(self.directory) / "hcp.sqlite3")
+
+    def __enter__(self) -> "SQLiteFixture":
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode = WAL")
+        for statement in sqlite_statements(dump_statements(self.schema_path.read_text())): connection.execute(statement)
+        connection.commit(); connection.close()
+        return self
+
+    def connect(self) -> SQLiteConnection: return SQLiteConnection(self.path)
+
+    def install(self, main_module):
+        main_module.get_db_connection = self.connect
+        main_module.init_db_pool = lambda: self
+        main_module.close_db_pool = lambda: None
+
+    def __exit__(self, *exc): shutil.rmtree(self.directory, ignore_errors=True)
+
+# --- MySQL / MariaDB ---
+class MySQLFixture:
+    def __init__(self, schema_path: Path = SCHEMA_PATH):
+        self.schema_path = schema_path
+        self.name = f"hcp_bench_{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+
+    def _server_connection(self, database: str = None):
+        import main
+        return main.mysql.connector.connect(host=main.DB_HOST, user=main.DB_USER, password=main.DB_PASSWORD,
+                                            database=database, connection_timeout=main.DB_CONNECT_TIMEOUT)
+
+    def __enter__(self) -> "MySQLFixture":
+        connection = self._server_connection()
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE `{self.name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci")
+        cursor.execute(f"USE `{self.name}`")
+        for statement in dump_statements(self.schema_path.read_text()):
+            if statement.upper().startswith(("SET", "START TRANSACTION", "COMMIT")): continue
+            cursor.execute(statement)
+        connection.commit(); cursor.close(); connection.close()
+        return self
+
+    def install(self, main_module):
+        main_module.close_db_pool()
+        main_module.DB_NAME = self.name
+        main_module.DB_POOL_NAME = self.name
+
+    def __exit__(self, *exc):
+        import main
+        main.close_db_pool()
+        connection = self._server_connection()
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{self.name}`")
+        cursor.close(); connection.close()
@@ -0,0 +1,153 @@
+# fake_groq.py
+# Local stand-in for Groq's OpenAI-compatible chat-completions endpoint, so the agent can be benchmarked
+# without network access or API spend. Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+# Supports a fixed latency with jitter, streaming (SSE chunks plus x_groq.usage on the final chunk), scripted
+# replies loaded from a JSON file (a list of strings or JSON objects, served round-robin) and a configurable
+# share of malformed replies to exercise the LLMBadJSON path.
+# Run standalone from the backend directory:
+#   python -m benchmarks.fake_groq --port 8911 --latency-ms 300 --malformed-rate 0.05
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+DEFAULT_SCRIPT = [
+    {"conversational_reply": "Got it - I've noted your meeting with Dr. Evelyn Hayes.",
+     "action_details": {"type": "EXTRACT_INFO", "extracted_fields": {
+         "hcpName": "Dr. Evelyn Hayes", "interactionType": "Meeting", "sentiment": "Positive",
+         "topicsDiscussed": "OncoBoost Phase III efficacy data", "productsDiscussed": ["OncoBoost"],
+         "materialsShared": ["OncoBoost Phase III PDF"], "followUpActions": "Send dosing guide next week"}}},
+    {"conversational_reply": "Updated the sentiment to Neutral.",
+     "action_details": {"type": "EDIT_FIELD", "field_to_edit": "sentiment", "new_value": "Neutral"}},
+    {"conversational_reply": "Let me pull up that profile.",
+     "action_details": {"type": "RETRIEVE_HCP_PROFILE", "hcp_name": "Dr. Evelyn Hayes"}},
+    {"conversational_reply": "Logged the call with Dr. Ben Carter about PulmoClear.",
+     "action_details": {"type": "EXTRACT_INFO", "extracted_fields": {
+         "hcpName": "Dr. Ben Carter", "interactionType": "Virtual Call", "sentiment": "Neutral",
+         "topicsDiscussed": "PulmoClear FEV1 results", "productsDiscussed": ["PulmoClear"]}}},
+]
+MALFORMED_REPLIES = [
+    '{"conversational_reply": "Noted the meeting", "action_details": {"type": "EXTRACT_INFO", "extracted_fields": {"hcpName": "Dr. Hayes"',
+    "Sure! I logged that interaction for you.",
+    '```json\n{"conversational_reply": "Done", "action_details": {"type": "EXTRACT_INFO",}}\n```',
+]
+
+@dataclass
+class FakeGroqConfig:
+    latency_ms: float = 200.0         # time to first token (non-streaming: time to full reply)
+    jitter_ms: float = 0.0            # uniform +/- jitter applied to latency_ms
+    stream_chunk_chars: int = 12
+    stream_chunk_delay_ms: float = 5.0
+    malformed_rate: float = 0.0       # share of replies drawn from MALFORMED_REPLIES
+    script: List[str] = field(default_factory=lambda: [json.dumps(reply) for reply in DEFAULT_SCRIPT])
+    seed: Optional[int] = 7
+
+def load_script(path: str) -> List[str]:
+    with open(path) as f: entries = json.load(f)
+    return [entry if isinstance(entry, str) else json.dumps(entry) for entry in entries]
+
+def create_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI(title="fake-groq")
+    rng = random.Random(config.seed)
+    script_cycle = itertools.cycle(config.script)
+    lock = threading.Lock()
+    stats = {"requests": 0, "streamed": 0, "malformed": 0}
+
+    def next_reply() -> str:
+        with lock:
+            stats["requests"] += 1
+            if config.malformed_rate and rng.random() < config.malformed_rate:
+                stats["malformed"] += 1
+                return rng.choice(MALFORMED_REPLIES)
+            return next(script_cycle)
+
+    def latency() -> float:
+        return max(0.0, config.latency_ms + (rng.uniform(-config.jitter_ms, config.jitter_ms) if config.jitter_ms else 0.0)) / 1000
+
+    def usage(messages: list, reply: str) -> dict:
+        # ~4 characters per token is close enough for sizing histograms.
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+        completion_tokens = len(reply) // 4 + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict):
+        reply, model, created = next_reply(), body.get("model", "fake"), int(time.time())
+        await asyncio.sleep(latency())
+        if not body.get("stream"):
+            return {"id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                    "usage": usage(body.get("messages", []), reply)}
+        stats["streamed"] += 1
+
+        async def events():
+            for offset in range(0, len(reply), config.stream_chunk_chars):
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": reply[offset:offset + config.stream_chunk_chars]}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if config.stream_chunk_delay_ms: await asyncio.sleep(config.stream_chunk_delay_ms / 1000)
+            final = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "x_groq": {"id": "req-fake", "usage": usage(body.get("messages", []), reply)}}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def fake_stats(): return stats
+
+    return app
+
+class FakeGroqServer:
+    """Runs the fake API on a background thread; use as a context manager or call start()/stop()."""
+    def __init__(self, config: Optional[FakeGroqConfig] = None, host: str = "127.0.0.1", port: int = 8911):
+        self.config = config or FakeGroqConfig()
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(create_app(self.config), host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "FakeGroqServer":
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline or not self._thread.is_alive(): raise RuntimeError(f"fake Groq server failed to start on {self.url}")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+def parse_config(args) -> FakeGroqConfig:
+    config = FakeGroqConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, stream_chunk_chars=args.chunk_chars,
+                            stream_chunk_delay_ms=args.chunk_delay_ms, malformed_rate=args.malformed_rate)
+    if args.script: config.script = load_script(args.script)
+    return config
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=12, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0, help="delay between streamed chunks")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of replies that are not valid JSON")
+    parser.add_argument("--script", help="JSON file with a list of replies (strings or objects) served round-robin")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake of the Groq chat-completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(parse_config(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,196 @@
+# load_test.py
+# Offline load scenarios for the chat and structured-save endpoints. Starts the fake Groq server and the real
+# app (uvicorn, on a disposable database: SQLite by default, or a throwaway MySQL database with --db mysql) as
+# separate processes, so neither shares a GIL with the load generator, and drives the app over HTTP at rising
+# concurrency. For every scenario/concurrency step it reports throughput, p50/p95/p99 latency, errors and the
+# backend process's RSS. Results can be saved as a baseline and later runs compared against it (exit status 1
+# when p95 or throughput regress beyond --tolerance).
+# Run from the backend directory:
+#   python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --save-baseline benchmarks/baselines/local.json
+#   python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --compare benchmarks/baselines/local.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_groq import add_config_arguments
+
+SCENARIOS = ("chat", "chat_stream", "structured")
+CHAT_MESSAGES = [
+    "Met {hcp} today to go over the OncoBoost Phase III data, she was very positive and asked for the dosing guide ({n})",
+    "Quick virtual call with {hcp} about PulmoClear FEV1 results, neutral overall, follow up in two weeks ({n})",
+    "Dropped off OncoBoost samples with {hcp}, discussed side effects, agreed to review two patient cases ({n})",
+]
+HCPS = ["Dr. Evelyn Hayes", "Dr. Ben Carter", "Dr. Priya Raman", "Dr. Tom Okafor"]
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # no procfs (macOS)
+        return int(subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout or 0) / 1024
+
+def percentile(samples, pct: int) -> float:
+    return statistics.quantiles(samples, n=100)[pct - 1] if len(samples) > 1 else (samples[0] if samples else 0.0)
+
+def request_for(scenario: str, n: int) -> dict:
+    hcp = HCPS[n % len(HCPS)]
+    if scenario in ("chat", "chat_stream"):
+        # A unique suffix keeps every turn on the LLM path instead of the response cache.
+        message = CHAT_MESSAGES[n % len(CHAT_MESSAGES)].format(hcp=hcp, n=uuid.uuid4().hex[:8])
+        path = "/interactions/log_chat_message" + ("/stream" if scenario == "chat_stream" else "")
+        return {"path": path, "json": {"user_message": message}}
+    return {"path": "/interactions/log_structured", "json": {
+        "hcpName": hcp, "interactionType": "Meeting", "date": "2025-05-20", "time": "09:30", "sentiment": "Positive",
+        "topicsDiscussed": "Efficacy data and dosing", "outcomes": "Agreed to review data", "followUpActions": "Follow up in 2 weeks",
+        "materialsShared": [{"id": 1, "name": "Phase III PDF"}], "samplesDistributed": [{"id": 1, "name": "OncoBoost"}],
+        "productsDiscussed": ["OncoBoost", "PulmoClear"], "idempotencyKey": uuid.uuid4().hex, "chatSessionId": "load_test"}}
+
+async def send(client: httpx.AsyncClient, scenario: str, n: int) -> bool:
+    request = request_for(scenario, n)
+    if scenario == "chat_stream":
+        async with client.stream("POST", request["path"], json=request["json"]) as response:
+            body = "".join([chunk async for chunk in response.aiter_text()])
+            return response.status_code == 200 and "event: done" in body
+    response = await client.post(request["path"], json=request["json"])
+    return response.status_code in (200, 202)  # 202: accepted by the write-behind spool
+
+async def run_step(base_url: str, scenario: str, concurrency: int, total: int, warmup: int, backend_pid: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for n in range(warmup): await send(client, scenario, n)
+        latencies, errors, counter = [], 0, iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for n in counter:
+                started = time.perf_counter()
+                try: ok = await send(client, scenario, n)
+                except httpx.HTTPError: ok = False
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"scenario": scenario, "concurrency": concurrency, "requests": total, "errors": errors,
+            "throughput_rps": round(total / elapsed, 2), "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2), "p99_ms": round(percentile(latencies, 99), 2), "rss_mb": round(rss_mb(backend_pid), 1)}
+
+def serve_backend(port: int, db: str):
+    """Entry point of the backend subprocess: the real app on a disposable database."""
+    import uvicorn
+    import main
+    from benchmarks.db_fixture import MySQLFixture, SQLiteFixture
+    with (MySQLFixture() if db == "mysql" else SQLiteFixture()) as fixture:
+        fixture.install(main)
+        # stop() sends SIGINT; uvicorn re-raises it after a graceful shutdown, and the fixture is removed on the way out.
+        try: uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+        except KeyboardInterrupt: pass
+
+def spawn(module_args: list, env: dict, ready_url: str) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-m", *module_args], cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None: raise SystemExit(f"{module_args[0]} exited with status {process.returncode} during startup.")
+        try:
+            httpx.get(ready_url, timeout=1)
+            return process
+        except httpx.HTTPError: time.sleep(0.05)
+    stop(process)
+    raise SystemExit(f"{module_args[0]} did not answer on {ready_url} within 60s.")
+
+def stop(process: subprocess.Popen):
+    process.send_signal(signal.SIGINT)
+    try: process.wait(timeout=15)
+    except subprocess.TimeoutExpired: process.kill(); process.wait()
+
+def compare(results: list, baseline_path: str, tolerance: float) -> bool:
+    baseline = {(r["scenario"], r["concurrency"]): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    regressed = False
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in results:
+        base = baseline.get((result["scenario"], result["concurrency"]))
+        if not base: print(f"  {result['scenario']:12s} c={result['concurrency']:<4d} no baseline entry"); continue
+        p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps_change = (result["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"] if base["throughput_rps"] else 0.0
+        flag = p95_change > tolerance or rps_change < -tolerance
+        regressed |= flag
+        print(f"  {result['scenario']:12s} c={result['concurrency']:<4d} p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+def main_():
+    parser = argparse.ArgumentParser(description="Offline load test for the interaction endpoints.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--db", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--groq-url", help="use an already running (fake) Groq server instead of starting one")
+    parser.add_argument("--save-baseline", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput regression")
+    parser.add_argument("--serve-backend", type=int, metavar="PORT", help=argparse.SUPPRESS)  # internal: backend subprocess
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if args.serve_backend: return serve_backend(args.serve_backend, args.db)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown: parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    env = dict(os.environ)
+    fake = backend = None
+    results = []
+    try:
+        if not args.groq_url:
+            fake_port = free_port()
+            fake = spawn(["benchmarks.fake_groq", "--port", str(fake_port), "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                          "--chunk-chars", str(args.chunk_chars), "--chunk-delay-ms", str(args.chunk_delay_ms), "--malformed-rate", str(args.malformed_rate)]
+                         + (["--script", args.script] if args.script else []), env, f"http://127.0.0.1:{fake_port}/stats")
+        env["GROQ_BASE_URL"] = args.groq_url or f"http://127.0.0.1:{fake_port}"
+        port = free_port()
+        backend = spawn(["benchmarks.load_test", "--serve-backend", str(port), "--db", args.db], env, f"http://127.0.0.1:{port}/")
+        print(f"{'scenario':12s} {'conc':>5s} {'req':>6s} {'err':>5s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'rss MB':>8s}")
+        for scenario in scenarios:
+            for concurrency in levels:
+                r = asyncio.run(run_step(f"http://127.0.0.1:{port}", scenario, concurrency, args.requests, args.warmup, backend.pid))
+                results.append(r)
+                print(f"{r['scenario']:12s} {r['concurrency']:5d} {r['requests']:6d} {r['errors']:5d} {r['throughput_rps']:9.1f} "
+                      f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} {r['rss_mb']:8.1f}")
+    finally:
+        for process in (backend, fake):
+            if process: stop(process)
+
+    if args.save_baseline:
+        import main  # for the configured LLM concurrency; the backend subprocess reads the same environment
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        meta = {"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "db": args.db, "python": platform.python_version(),
+                "platform": platform.platform(), "cpu_count": os.cpu_count(), "fake_groq": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                "malformed_rate": args.malformed_rate, "chunk_chars": args.chunk_chars, "chunk_delay_ms": args.chunk_delay_ms},
+                "llm_max_concurrency": main.LLM_MAX_CONCURRENCY}
+        Path(args.save_baseline).write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.compare and compare(results, args.compare, args.tolerance): raise SystemExit(1)
+
+if __name__ == "__main__":
+    main_()
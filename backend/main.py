@@ -1,54 +1,253 @@
 # main.py
 import os
 import json
+import base64
 import re
-from fastapi import FastAPI, HTTPException
+import time
+import hashlib
+import heapq
+import uuid
+import asyncio
+import threading
+import logging
+import random
+import bisect
+import inspect
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from itertools import chain
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field as PydanticField
-from typing import List, Optional, Dict, Any, TypedDict
-from datetime import date as d, time as t
+from pydantic import BaseModel, Field as PydanticField, ValidationError
+from typing import List, Optional, Dict, Any, TypedDict, Union
+from datetime import date as d, time as t, datetime, timedelta
 
 import mysql.connector
-from mysql.connector import Error as MySQLError
+from mysql.connector import pooling
+from mysql.connector import Error as MySQLError, PoolError
 
-from groq import Groq
+from groq import AsyncGroq
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from langchain_core.runnables import RunnableConfig
 
 load_dotenv()
 
-# --- Database Configuration & Connection ---
-DB_HOST = 'localhost'
+# --- Logging, Metrics & Tracing ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("hcp_crm")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "100"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ") for value in values)
+    pairs = [f'{name}="{value}"' for name, value in zip(names, escaped)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Prometheus-style histogram keyed by label values. observe() is a bisect and two adds under a lock."""
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help_text, self.label_names, self.buckets = name, help_text, label_names, buckets
+        self._series: Dict[tuple, list] = {}  # label values -> per-bucket counts (last is +Inf), then sum
+        self._lock = threading.Lock()
+        registered_metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED: return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None: series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock: snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_text(self.label_names, labels)} {cumulative}")
+        return lines
+
+class MetricCounter:
+    """Prometheus-style monotonically increasing counter keyed by label values."""
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self._values: Counter = Counter()
+        self._lock = threading.Lock()
+        registered_metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        if not METRICS_ENABLED: return
+        with self._lock: self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock: snapshot = dict(self._values)
+        lines.extend(f"{self.name}{_label_text(self.label_names, labels)} {value}" for labels, value in sorted(snapshot.items()))
+        return lines
+
+registered_metrics: List[Any] = []
+agent_node_seconds = Histogram("hcp_agent_node_seconds", "Wall time per LangGraph node.", ("node",))
+agent_turn_seconds = Histogram("hcp_agent_turn_seconds", "Wall time per chat turn through the agent.", ("endpoint",))
+agent_routes_total = MetricCounter("hcp_agent_routes_total", "Routing decisions taken after the fast path and the LLM.", ("router", "route"))
+llm_request_seconds = Histogram("hcp_llm_request_seconds", "Groq round-trip time, including the wait for a concurrency slot.", ("mode",))
+llm_tokens = Histogram("hcp_llm_tokens", "Tokens per Groq call.", ("kind",), TOKEN_BUCKETS)
+llm_responses_total = MetricCounter("hcp_llm_responses_total", "LLM turns by outcome (ok, cached, bad_json, error).", ("outcome",))
+db_operation_seconds = Histogram("hcp_db_operation_seconds", "Time per database operation, including connection checkout.", ("operation",))
+db_pool_wait_seconds = Histogram("hcp_db_pool_wait_seconds", "Time spent waiting for a pooled connection.")
+
+# Sampled tracing: a sampled request carries a span list in a context variable, which asyncio tasks and
+# run_in_threadpool inherit; unsampled requests pay one ContextVar lookup per timed block.
+current_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_trace", default=None)
+recent_traces: deque = deque(maxlen=TRACE_KEEP)
+
+def start_trace(name: str):
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE: return None
+    return current_trace.set({"trace_id": uuid.uuid4().hex[:16], "name": name, "started": time.perf_counter(), "spans": []})
+
+def finish_trace(token):
+    if token is None: return
+    trace = current_trace.get()
+    current_trace.reset(token)
+    trace["duration_ms"] = round((time.perf_counter() - trace.pop("started")) * 1000, 2)
+    recent_traces.append(trace)
+    logger.info("trace %s %s %.1f ms: %s", trace["trace_id"], trace["name"], trace["duration_ms"],
+                ", ".join(f"{span['name']}={span['duration_ms']}ms" for span in trace["spans"]))
+
+@contextmanager
+def timed(histogram: Histogram, *labels):
+    """Observes the block's wall time on `histogram` and, inside a sampled trace, records it as a span."""
+    started = time.perf_counter()
+    try: yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, *labels)
+        trace = current_trace.get()
+        if trace is not None:
+            trace["spans"].append({"name": ":".join((histogram.name.removeprefix("hcp_").removesuffix("_seconds"),) + labels),
+                                   "offset_ms": round((started - trace["started"]) * 1000, 2), "duration_ms": round(elapsed * 1000, 2)})
+
+def db_timed(operation: str):
+    """Decorator for blocking DB functions: times each call into hcp_db_operation_seconds{operation}."""
+    def decorate(fn):
+        def run(*args, **kwargs):
+            with timed(db_operation_seconds, operation): return fn(*args, **kwargs)
+        run.__name__, run.__doc__ = fn.__name__, fn.__doc__
+        return run
+    return decorate
+
+def render_metrics() -> str:
+    lines = list(chain.from_iterable(metric.render() for metric in registered_metrics))
+    # Point-in-time counters kept as plain dicts elsewhere in this module.
+    point_in_time = [("hcp_db_pool", db_pool_metrics), ("hcp_interaction_writes", write_stats), ("hcp_fast_path", fast_path_stats)]
+    if write_behind: point_in_time.append(("hcp_write_behind", write_behind.snapshot()))
+    for prefix, stats in point_in_time:
+        lines.extend(f"{prefix}_{key} {value}" for key, value in stats.items() if isinstance(value, (int, float)))
+    return "\n".join(lines) + "\n"
+
+# --- Database Configuration & Connection Pool ---
+DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
+DB_POOL_NAME = "hcp_crm_pool"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
 
-def get_db_connection():
-    print(f"Attempting DB connection with: HOST='{DB_HOST}', USER='{DB_USER}', DB_NAME='{DB_NAME}'")
+db_pool: Optional[pooling.MySQLConnectionPool] = None
+db_pool_lock = threading.Lock()
+db_pool_metrics: Dict[str, Any] = {
+    "acquired": 0, "acquire_timeouts": 0, "acquire_wait_total_ms": 0.0, "acquire_wait_max_ms": 0.0,
+    "health_check_failures": 0,
+}
+
+def init_db_pool() -> Optional[pooling.MySQLConnectionPool]:
+    """Creates the shared connection pool once per worker (called from the app lifespan)."""
+    global db_pool
     missing_vars = []
     if not DB_HOST: missing_vars.append("DB_HOST")
     if not DB_USER: missing_vars.append("DB_USER")
     if DB_PASSWORD is None: missing_vars.append("DB_PASSWORD (it's None, should be at least an empty string \"\" if no password)")
     if not DB_NAME: missing_vars.append("DB_NAME")
     if missing_vars:
-        print(f"ERROR: The following database configuration variables are missing or not loaded correctly from .env: {', '.join(missing_vars)}")
+        logger.error("The following database configuration variables are missing or not loaded correctly from .env: %s", ", ".join(missing_vars))
         return None
+    logger.info("Creating DB pool '%s' (size=%d) with: HOST='%s', USER='%s', DB_NAME='%s'", DB_POOL_NAME, DB_POOL_SIZE, DB_HOST, DB_USER, DB_NAME)
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, connection_timeout=10
+        db_pool = pooling.MySQLConnectionPool(
+            pool_name=DB_POOL_NAME, pool_size=DB_POOL_SIZE, pool_reset_session=True,
+            host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, connection_timeout=DB_CONNECT_TIMEOUT
         )
-        if conn.is_connected():
-            return conn
-        return None
+        return db_pool
     except MySQLError as e:
-        print(f"MySQL Connection Error: {e.errno} - {e.msg}")
+        logger.error("MySQL Pool Creation Error: %s - %s", e.errno, e.msg)
         return None
     except Exception as e:
-        print(f"An unexpected error occurred during DB connection: {e}")
+        logger.exception("An unexpected error occurred during DB pool creation: %s", e)
         return None
 
+def close_db_pool():
+    global db_pool
+    if db_pool is not None:
+        try: db_pool._remove_connections()
+        except Exception as e: logger.warning("Error closing DB pool: %s", e)
+        db_pool = None
+
+def get_db_connection():
+    """Borrows a health-checked connection from the pool, waiting up to DB_POOL_ACQUIRE_TIMEOUT.
+    Blocking - call it from a worker thread, never directly on the event loop. Closing the
+    returned connection hands it back to the pool."""
+    if db_pool is None:
+        with db_pool_lock:
+            if db_pool is None and init_db_pool() is None: return None
+    started = time.perf_counter()
+    deadline = started + DB_POOL_ACQUIRE_TIMEOUT
+    while True:
+        try:
+            conn = db_pool.get_connection()
+            break
+        except PoolError:
+            if time.perf_counter() >= deadline:
+                db_pool_metrics["acquire_timeouts"] += 1
+                logger.error("Timed out after %ss waiting for a pooled DB connection.", DB_POOL_ACQUIRE_TIMEOUT)
+                return None
+            time.sleep(0.01)
+        except MySQLError as e:
+            logger.error("MySQL Connection Error: %s - %s", e.errno, e.msg)
+            return None
+    try:
+        conn.ping(reconnect=True, attempts=2, delay=0)
+    except MySQLError as e:
+        db_pool_metrics["health_check_failures"] += 1
+        logger.warning("MySQL health check failed on pooled connection: %s", e)
+        try: conn.close()
+        except Exception: pass
+        return None
+    waited_ms = (time.perf_counter() - started) * 1000
+    db_pool_wait_seconds.observe(waited_ms / 1000)
+    db_pool_metrics["acquired"] += 1
+    db_pool_metrics["acquire_wait_total_ms"] += waited_ms
+    db_pool_metrics["acquire_wait_max_ms"] = max(db_pool_metrics["acquire_wait_max_ms"], waited_ms)
+    return conn
+
 # --- Pydantic Models ---
 class MaterialItem(BaseModel):
     id: Any 
@@ -67,7 +266,9 @@ class InteractionLogBase(BaseModel):
     outcomes: Optional[str] = PydanticField(None)
     followUpActions: Optional[str] = PydanticField(None)
     chatSessionId: Optional[str] = PydanticField(None)
+    idempotencyKey: Optional[str] = PydanticField(None, max_length=64)
     productsDiscussed: Optional[List[str]] = PydanticField(default_factory=list)
+    version: Optional[int] = PydanticField(None)  # version last read; updates with a stale version get 409
 
 class InteractionLogCreate(InteractionLogBase):
     id: Optional[int] = PydanticField(None)
@@ -75,6 +276,39 @@ class InteractionLogCreate(InteractionLogBase):
 class InteractionLogResponse(InteractionLogBase):
     id: int 
     message: Optional[str] = None
+    rowsWritten: Optional[int] = None
+
+class InteractionLogAccepted(BaseModel):
+    accepted_id: str  # the log's (or the update's) idempotencyKey; look it up with GET /interactions/accepted/{accepted_id}
+    status: str = "accepted"
+    queue_depth: int
+    message: str
+
+class InteractionLogPage(BaseModel):
+    items: List[InteractionLogResponse]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page; None on the last page
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "created", "updated", "unchanged", "duplicate" or "failed"
+    id: Optional[int] = None
+    idempotencyKey: Optional[str] = None
+    version: Optional[int] = None
+    rowsWritten: int = 0
+    error: Optional[str] = None
+    retryable: bool = False  # failed on an unreachable database or a transient error (deadlock, lost connection)
+
+class BatchIngestResponse(BaseModel):
+    received: int
+    created: int
+    updated: int
+    unchanged: int = 0
+    duplicates: int
+    failed: int
+    rows_written: int = 0
+    truncated: bool = False  # NDJSON stream cut off at BATCH_MAX_ITEMS; resend from the first failed index
+    elapsed_ms: float
+    results: List[BatchItemResult]
 
 class AIChatMessage(BaseModel):
     hcp_id: Optional[str] = PydanticField(None)
@@ -89,6 +323,779 @@ class AIChatResponse(BaseModel):
     session_id: Optional[str] = PydanticField(None)
 
 
+# --- Session State Store ---
+# Keeps the agent's conversation and extracted fields between turns, keyed by session_id.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" or "redis"
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_HISTORY_WINDOW = int(os.getenv("SESSION_HISTORY_WINDOW", "6"))
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "1500"))
+
+class InMemorySessionStore:
+    """Per-worker LRU of serialized sessions with idle-TTL eviction."""
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # session_id -> (expires_at, json_str)
+        self.hits = 0; self.misses = 0; self.evictions = 0
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(session_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None: del self._data[session_id]; self.evictions += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(session_id)
+        self.hits += 1
+        return json.loads(entry[1])
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        self._data[session_id] = (time.monotonic() + self.ttl_seconds, json.dumps(session, default=str))
+        self._data.move_to_end(session_id)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False); self.evictions += 1
+
+    async def delete(self, session_id: str):
+        self._data.pop(session_id, None)
+
+    async def session_bytes(self, session_id: str) -> int:
+        entry = self._data.get(session_id)
+        return len(entry[1].encode("utf-8")) if entry else 0
+
+    async def stats(self) -> Dict[str, Any]:
+        sizes = [len(v[1].encode("utf-8")) for v in self._data.values()]
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory", "sessions": len(sizes), "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0, "evictions": self.evictions,
+            "avg_session_bytes": round(sum(sizes) / len(sizes), 1) if sizes else 0, "max_session_bytes": max(sizes, default=0),
+        }
+
+class RedisSessionStore:
+    """Redis-protocol backend (works with any compatible server); TTL is refreshed on every write."""
+    def __init__(self, client, ttl_seconds: int = SESSION_TTL_SECONDS, key_prefix: str = "hcp_session:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.hits = 0; self.misses = 0
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.key_prefix + session_id)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        await self.client.set(self.key_prefix + session_id, json.dumps(session, default=str), ex=self.ttl_seconds)
+
+    async def delete(self, session_id: str):
+        await self.client.delete(self.key_prefix + session_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    async def session_bytes(self, session_id: str) -> int:
+        return await self.client.strlen(self.key_prefix + session_id)
+
+def create_session_store():
+    if SESSION_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+            return RedisSessionStore(redis_asyncio.from_url(SESSION_REDIS_URL))
+        except ImportError:
+            logger.warning("SESSION_BACKEND=redis but the 'redis' package is not installed; falling back to in-memory sessions.")
+    return InMemorySessionStore()
+
+session_store = create_session_store()
+
+def messages_to_session(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": "user" if isinstance(m, HumanMessage) else "assistant", "content": m.content} for m in messages]
+
+def messages_from_session(items: List[Dict[str, str]]) -> List[BaseMessage]:
+    return [HumanMessage(content=i["content"]) if i["role"] == "user" else AIMessage(content=i["content"]) for i in items]
+
+def compact_session_history(messages: List[Dict[str, str]], summary: str):
+    """Keeps the last SESSION_HISTORY_WINDOW messages verbatim and folds older ones into a bounded rolling summary."""
+    if len(messages) <= SESSION_HISTORY_WINDOW:
+        return messages, summary
+    overflow, kept = messages[:-SESSION_HISTORY_WINDOW], messages[-SESSION_HISTORY_WINDOW:]
+    folded = "\n".join(f"{m['role']}: {m['content'][:200]}" for m in overflow)
+    summary = f"{summary}\n{folded}".strip() if summary else folded
+    return kept, summary[-SESSION_SUMMARY_MAX_CHARS:]
+
+
+# --- Interaction Log Persistence ---
+INTERACTION_LOG_COLUMNS = ["hcpName", "interactionType", "interactionDate", "interactionTime", "attendees",
+    "topicsDiscussed", "sentiment", "outcomes", "followUpActions", "chatSessionId", "idempotencyKey"]
+# child table -> (value column, extractor)
+CHILD_TABLES = {
+    "interaction_materials_shared": ("material_name", lambda data: [m.name for m in data.materialsShared or []]),
+    "interaction_samples_distributed": ("sample_name", lambda data: [s.name for s in data.samplesDistributed or []]),
+    "interaction_products_discussed_ai": ("product_name", lambda data: list(data.productsDiscussed or [])),
+}
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+DB_UNAVAILABLE_ERROR = "Database connection failed."
+# Lock wait timeout, deadlock and lost-connection errnos: the same write can succeed when simply retried.
+TRANSIENT_DB_ERRNOS = {1205, 1213, 2006, 2013, 2055}
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50000"))
+
+def is_transient_db_error(e: MySQLError) -> bool:
+    return isinstance(e, (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)) or e.errno in TRANSIENT_DB_ERRNOS
+
+def interaction_log_row(data: InteractionLogCreate) -> tuple:
+    return (data.hcpName, data.interactionType, data.date, data.time, data.attendees, data.topicsDiscussed,
+            data.sentiment, data.outcomes, data.followUpActions, data.chatSessionId, data.idempotencyKey)
+
+def insert_rows(cursor, table: str, columns: List[str], rows: List[tuple], on_duplicate: str = "") -> int:
+    """One multi-row INSERT statement for all `rows`; `on_duplicate` is an optional ON DUPLICATE KEY UPDATE clause."""
+    if not rows: return 0
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(rows))}"
+                   + (f" ON DUPLICATE KEY UPDATE {on_duplicate}" if on_duplicate else ""),
+                   [value for row in rows for value in row])
+    return len(rows)
+
+# Write amplification counters, exposed on /interactions/write_stats. Writers count into a local Counter and add
+# it here only once the transaction commits (or a version conflict is reported), so a chunk that is rolled back
+# and retried item by item is counted once.
+write_stats: Dict[str, int] = {"writes": 0, "rows_written": 0, "unchanged": 0, "version_conflicts": 0}
+
+def count_write(stats: Counter, result: Dict[str, Any]) -> Dict[str, Any]:
+    stats["writes"] += 1
+    stats["rows_written"] += result["rows_written"]
+    if result["status"] == "unchanged": stats["unchanged"] += 1
+    return result
+
+def record_write_stats(stats: Counter):
+    for name, count in stats.items(): write_stats[name] += count
+
+def _stored_value(value):
+    # mysql-connector returns TIME columns as timedelta; compare against the model's datetime.time.
+    if isinstance(value, timedelta): return (datetime.min + value).time()
+    return value
+
+def record_update_key(cursor, key: Optional[str], log_id: int, version: int):
+    # Bookkeeping like the rollups, so it is not counted in rows_written.
+    if key: insert_rows(cursor, "interaction_log_updates", ["idempotencyKey", "interaction_log_id", "version"], [(key, log_id, version)])
+
+def _update_interaction_log(cursor, interaction_data: InteractionLogCreate, stats: Counter) -> Dict[str, Any]:
+    """Diff-based update: only changed parent columns are written, child rows are inserted/deleted
+    individually, and nothing at all is written when the log is unchanged. The conditional
+    UPDATE on `version` detects concurrent edits without holding row locks between read and write. An
+    update's idempotencyKey goes into interaction_log_updates in the same transaction, so a replayed
+    update comes back as a duplicate instead of a version conflict."""
+    log_id, key = interaction_data.id, interaction_data.idempotencyKey
+    if key:
+        cursor.execute("SELECT interaction_log_id, version FROM interaction_log_updates WHERE idempotencyKey = %s", (key,))
+        applied = cursor.fetchone()
+        if applied: return {"id": applied[0], "status": "duplicate", "rows_written": 0, "version": applied[1]}
+    columns = INTERACTION_LOG_COLUMNS[:-1]  # idempotencyKey is fixed at creation
+    cursor.execute(f"SELECT {', '.join(columns)}, version FROM interaction_logs WHERE id = %s", (log_id,))
+    stored = cursor.fetchone()
+    if stored is None: raise HTTPException(status_code=404, detail=f"Log ID {log_id} not found for update.")
+    stored_version = stored[-1]
+    if interaction_data.version is not None and interaction_data.version != stored_version:
+        stats["version_conflicts"] += 1
+        raise HTTPException(status_code=409, detail=f"Log ID {log_id} was modified by someone else (version {stored_version}, you sent {interaction_data.version}). Reload and retry.")
+
+    wanted = interaction_log_row(interaction_data)[:-1]
+    changed = {col: new for col, old, new in zip(columns, stored[:-1], wanted) if _stored_value(old) != new}
+
+    child_changes, stored_children = {}, {}
+    for table_name, (value_column, extract) in CHILD_TABLES.items():
+        cursor.execute(f"SELECT id, {value_column} FROM {table_name} WHERE interaction_log_id = %s", (log_id,))
+        stored_rows = cursor.fetchall()
+        stored_children[table_name] = [value for _, value in stored_rows]
+        to_add = Counter(extract(interaction_data)) - Counter(value for _, value in stored_rows)
+        surplus = Counter(value for _, value in stored_rows) - Counter(extract(interaction_data))
+        to_delete = []
+        for row_id, value in stored_rows:
+            if surplus[value] > 0: to_delete.append(row_id); surplus[value] -= 1
+        if to_add or to_delete: child_changes[table_name] = (value_column, list(to_add.elements()), to_delete)
+
+    if not changed and not child_changes:
+        record_update_key(cursor, key, log_id, stored_version)
+        return {"id": log_id, "status": "unchanged", "rows_written": 0, "version": stored_version}
+
+    assignments = "".join(f"{col} = %s, " for col in changed)
+    cursor.execute(f"UPDATE interaction_logs SET {assignments}version = version + 1 WHERE id = %s AND version = %s",
+                   tuple(changed.values()) + (log_id, stored_version))
+    if cursor.rowcount == 0:
+        stats["version_conflicts"] += 1
+        raise HTTPException(status_code=409, detail=f"Log ID {log_id} was modified concurrently. Reload and retry.")
+    rows_written = 1
+    for table_name, (value_column, to_add, to_delete) in child_changes.items():
+        if to_delete:
+            cursor.execute(f"DELETE FROM {table_name} WHERE id IN ({', '.join(['%s'] * len(to_delete))})", tuple(to_delete))
+            rows_written += len(to_delete)
+        rows_written += insert_rows(cursor, table_name, ["interaction_log_id", value_column], [(log_id, v) for v in to_add])
+    stored_log = dict(zip(columns, stored))
+    rollup_delta = Counter(rollup_keys(interaction_data.hcpName, interaction_data.date, interaction_data.sentiment, interaction_data.productsDiscussed))
+    rollup_delta.subtract(rollup_keys(stored_log["hcpName"], stored_log["interactionDate"], stored_log["sentiment"],
+                                      stored_children["interaction_products_discussed_ai"]))
+    apply_rollup_delta(cursor, rollup_delta)
+    record_update_key(cursor, key, log_id, stored_version + 1)
+    return {"id": log_id, "status": "updated", "rows_written": rows_written, "version": stored_version + 1}
+
+def write_interaction_log(cursor, interaction_data: InteractionLogCreate, stats: Counter) -> Dict[str, Any]:
+    """Writes one log and its child rows on an open cursor without committing, counting into `stats`. Returns a
+    dict with id, status ("created", "updated", "unchanged" or "duplicate"), rows_written and version."""
+    if interaction_data.id is not None:
+        return count_write(stats, _update_interaction_log(cursor, interaction_data, stats))
+    if interaction_data.idempotencyKey:
+        cursor.execute("SELECT id, version FROM interaction_logs WHERE idempotencyKey = %s", (interaction_data.idempotencyKey,))
+        existing = cursor.fetchone()
+        if existing: return count_write(stats, {"id": existing[0], "status": "duplicate", "rows_written": 0, "version": existing[1]})
+    rows_written = insert_rows(cursor, "interaction_logs", INTERACTION_LOG_COLUMNS, [interaction_log_row(interaction_data)])
+    interaction_id = cursor.lastrowid
+    for table_name, (value_column, extract) in CHILD_TABLES.items():
+        rows_written += insert_rows(cursor, table_name, ["interaction_log_id", value_column], [(interaction_id, v) for v in extract(interaction_data)])
+    apply_rollup_delta(cursor, Counter(rollup_keys(interaction_data.hcpName, interaction_data.date, interaction_data.sentiment, interaction_data.productsDiscussed)))
+    return count_write(stats, {"id": interaction_id, "status": "created", "rows_written": rows_written, "version": 1})
+
+def batch_item_result(index: int, data: InteractionLogCreate, result: Dict[str, Any]) -> BatchItemResult:
+    return BatchItemResult(index=index, status=result["status"], id=result["id"], idempotencyKey=data.idempotencyKey,
+                           version=result["version"], rowsWritten=result["rows_written"])
+
+def _write_batch_bulk(cursor, items: List[tuple], stats: Counter) -> List[BatchItemResult]:
+    """Multi-row path for one chunk of (index, InteractionLogCreate), counting into `stats`. Raises MySQLError on any DB failure."""
+    results: List[BatchItemResult] = []
+    inserts = []
+    for index, data in items:
+        if data.id is None:
+            inserts.append((index, data)); continue
+        try:
+            results.append(batch_item_result(index, data, write_interaction_log(cursor, data, stats)))
+        except HTTPException as he:
+            results.append(BatchItemResult(index=index, status="failed", idempotencyKey=data.idempotencyKey, error=he.detail))
+
+    # Every new row gets a key (generated when the client sent none) so ids can be read back without
+    # relying on consecutive AUTO_INCREMENT values. FOR UPDATE locks the client keys against racing retries.
+    client_keys = list({data.idempotencyKey for _, data in inserts if data.idempotencyKey})
+    existing: Dict[str, int] = {}
+    if client_keys:
+        cursor.execute(f"SELECT idempotencyKey, id FROM interaction_logs WHERE idempotencyKey IN ({', '.join(['%s'] * len(client_keys))}) FOR UPDATE", client_keys)
+        existing = dict(cursor.fetchall())
+    new_items, repeats, seen_keys = [], [], set()
+    for index, data in inserts:
+        key = data.idempotencyKey
+        if key in existing or key in seen_keys: repeats.append((index, key)); continue
+        if not key: data = data.model_copy(update={"idempotencyKey": uuid.uuid4().hex})
+        seen_keys.add(data.idempotencyKey)
+        new_items.append((index, data))
+
+    if new_items:
+        insert_rows(cursor, "interaction_logs", INTERACTION_LOG_COLUMNS, [interaction_log_row(data) for _, data in new_items])
+        keys = [data.idempotencyKey for _, data in new_items]
+        cursor.execute(f"SELECT idempotencyKey, id FROM interaction_logs WHERE idempotencyKey IN ({', '.join(['%s'] * len(keys))})", keys)
+        new_ids = dict(cursor.fetchall())
+        rows_written = len(new_items)
+        for table_name, (value_column, extract) in CHILD_TABLES.items():
+            rows_written += insert_rows(cursor, table_name, ["interaction_log_id", value_column],
+                                        [(new_ids[data.idempotencyKey], v) for _, data in new_items for v in extract(data)])
+        apply_rollup_delta(cursor, Counter(chain.from_iterable(
+            rollup_keys(data.hcpName, data.date, data.sentiment, data.productsDiscussed) for _, data in new_items)))
+        stats["writes"] += len(new_items); stats["rows_written"] += rows_written
+        existing.update(new_ids)
+        for index, data in new_items:
+            item_rows = 1 + sum(len(extract(data)) for _, extract in CHILD_TABLES.values())
+            results.append(BatchItemResult(index=index, status="created", id=new_ids[data.idempotencyKey], idempotencyKey=data.idempotencyKey, version=1, rowsWritten=item_rows))
+    results.extend(BatchItemResult(index=index, status="duplicate", id=existing.get(key), idempotencyKey=key) for index, key in repeats)
+    return results
+
+@db_timed("write_interaction_batch")
+def write_interaction_batch(items: List[tuple]) -> List[BatchItemResult]:
+    """Writes one chunk in a single transaction. If the multi-row path fails, the chunk is retried one
+    item per transaction so only the offending items are reported as failed. Blocking."""
+    conn = get_db_connection()
+    if not conn: return [BatchItemResult(index=i, status="failed", idempotencyKey=d.idempotencyKey, error=DB_UNAVAILABLE_ERROR, retryable=True) for i, d in items]
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        try:
+            stats = Counter()
+            results = _write_batch_bulk(cursor, items, stats)
+            conn.commit()
+            record_write_stats(stats)
+            return results
+        except MySQLError as e:
+            logger.warning("Batch chunk failed (%s); retrying %d items individually.", e, len(items))
+            conn.rollback()
+        results = []
+        for index, data in items:
+            stats = Counter()
+            try:
+                result = write_interaction_log(cursor, data, stats)
+                conn.commit(); record_write_stats(stats)
+                results.append(batch_item_result(index, data, result))
+            except HTTPException as he:
+                conn.rollback(); record_write_stats(stats); results.append(BatchItemResult(index=index, status="failed", idempotencyKey=data.idempotencyKey, error=he.detail))
+            except MySQLError as e:
+                conn.rollback(); results.append(BatchItemResult(index=index, status="failed", idempotencyKey=data.idempotencyKey, error=f"Database error: {e.msg}", retryable=is_transient_db_error(e)))
+        return results
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+def _validation_error_text(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+
+async def iter_batch_items(request: Request):
+    """Yields (index, InteractionLogCreate | error string) from a JSON array body or an NDJSON stream."""
+    if "ndjson" in request.headers.get("content-type", ""):
+        index, buffer = 0, b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip(): continue
+                try: yield index, InteractionLogCreate.model_validate_json(line)
+                except ValidationError as e: yield index, _validation_error_text(e)
+                index += 1
+        if buffer.strip():
+            try: yield index, InteractionLogCreate.model_validate_json(buffer)
+            except ValidationError as e: yield index, _validation_error_text(e)
+        return
+    try: body = await request.json()
+    except json.JSONDecodeError: raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON.")
+    if not isinstance(body, list): raise HTTPException(status_code=400, detail="Body must be a JSON array of interaction logs.")
+    if len(body) > BATCH_MAX_ITEMS: raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items.")
+    for index, raw in enumerate(body):
+        try: yield index, InteractionLogCreate.model_validate(raw)
+        except ValidationError as e: yield index, _validation_error_text(e)
+
+# --- Engagement Rollups ---
+# interaction_rollups holds one count per (dimension, value, week, sentiment), kept current inside the same
+# transaction as every log write, so dashboard reads never touch interaction_logs. Dimensions: "all" (value ""),
+# "hcp" (hcpName) and "product" (each distinct product discussed). Logs without an interactionDate are not rolled up.
+ROLLUP_DIMENSIONS = ("all", "hcp", "product")
+ROLLUP_COLUMNS = ["dimension", "dim_value", "week_start", "sentiment", "interaction_count"]
+ROLLUP_REBUILD_CHUNK = int(os.getenv("ROLLUP_REBUILD_CHUNK", "5000"))
+
+def rollup_keys(hcp_name: Optional[str], interaction_date: Optional[d], sentiment: Optional[str], products: Optional[List[str]]) -> List[tuple]:
+    """The rollup rows one log contributes +1 to."""
+    if not interaction_date: return []
+    week_start, sentiment = interaction_date - timedelta(days=interaction_date.weekday()), sentiment or ""
+    keys = [("all", "", week_start, sentiment)]
+    if hcp_name: keys.append(("hcp", hcp_name, week_start, sentiment))
+    keys.extend(("product", product, week_start, sentiment) for product in sorted(set(products or [])))
+    return keys
+
+def apply_rollup_delta(cursor, delta: Counter) -> int:
+    rows = [key + (count,) for key, count in delta.items() if count]
+    return insert_rows(cursor, "interaction_rollups", ROLLUP_COLUMNS, rows,
+                       on_duplicate="interaction_count = interaction_count + VALUES(interaction_count)")
+
+def _rollup_fold(counts: Counter) -> Counter:
+    # Mirror the case-insensitive collation of the rollup table's primary key when comparing.
+    folded = Counter()
+    for (dimension, value, week_start, sentiment), count in counts.items():
+        folded[(dimension, value.casefold(), week_start, sentiment.casefold())] += count
+    return +folded
+
+@db_timed("rebuild_rollups")
+def rebuild_rollups(apply: bool = True) -> Dict[str, Any]:
+    """Recomputes every rollup from interaction_logs with the same rollup_keys() the write path uses, reports
+    how many rollup rows had drifted and, if `apply`, replaces the table. Scans the whole log table in id
+    order; run it while writes are quiet, since logs saved during the scan can be missed. Blocking."""
+    conn = get_db_connection()
+    if not conn: raise HTTPException(status_code=503, detail="Database connection failed.")
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        computed, last_id, logs_scanned = Counter(), 0, 0
+        while True:
+            cursor.execute("SELECT id, hcpName, interactionDate, sentiment FROM interaction_logs WHERE id > %s ORDER BY id LIMIT %s",
+                           (last_id, ROLLUP_REBUILD_CHUNK))
+            logs = cursor.fetchall()
+            if not logs: break
+            ids = [row[0] for row in logs]
+            cursor.execute(f"SELECT interaction_log_id, product_name FROM interaction_products_discussed_ai WHERE interaction_log_id IN ({', '.join(['%s'] * len(ids))})", ids)
+            products: Dict[int, List[str]] = {}
+            for log_id, product_name in cursor.fetchall(): products.setdefault(log_id, []).append(product_name)
+            for log_id, hcp_name, interaction_date, sentiment in logs:
+                computed.update(rollup_keys(hcp_name, interaction_date, sentiment, products.get(log_id)))
+            last_id, logs_scanned = ids[-1], logs_scanned + len(logs)
+        cursor.execute(f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM interaction_rollups")
+        stored = Counter({tuple(row[:4]): row[4] for row in cursor.fetchall()})
+        expected, actual = _rollup_fold(computed), _rollup_fold(stored)
+        drifted = sum(1 for key in expected.keys() | actual.keys() if expected[key] != actual[key])
+        if apply and drifted:
+            cursor.execute("DELETE FROM interaction_rollups")
+            items = list(computed.items())
+            for offset in range(0, len(items), BATCH_CHUNK_SIZE):
+                apply_rollup_delta(cursor, Counter(dict(items[offset:offset + BATCH_CHUNK_SIZE])))
+            conn.commit()
+        logger.info("Rollup rebuild: %d logs scanned, %d rollup rows, %d drifted, applied=%s", logs_scanned, len(expected), drifted, apply and bool(drifted))
+        return {"logs_scanned": logs_scanned, "rollup_rows": len(expected), "drifted_rows": drifted, "rebuilt": apply and bool(drifted)}
+    except MySQLError as e: logger.error("DB error rebuilding rollups: %s", e); conn.rollback(); raise HTTPException(status_code=500, detail=f"Database error: {e.msg}")
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+@db_timed("query_engagement")
+def query_engagement(dimension: str, value: Optional[str] = None, week_from: Optional[d] = None, week_to: Optional[d] = None,
+                     limit: int = 20) -> Dict[str, Any]:
+    """Counts from interaction_rollups only, so cost depends on the weeks/values requested, not on the log table.
+    With a value (or dimension "all") returns a weekly series; without one, the top `limit` values. Blocking."""
+    if dimension not in ROLLUP_DIMENSIONS: raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}.")
+    series = bool(value) or dimension == "all"
+    where, params = ["dimension = %s", "interaction_count <> 0"], [dimension]
+    if series: where.append("dim_value = %s"); params.append(value or "")
+    if week_from: where.append("week_start >= %s"); params.append(week_from - timedelta(days=week_from.weekday()))
+    if week_to: where.append("week_start <= %s"); params.append(week_to)
+    group = "week_start" if series else "dim_value"
+    sql = f"SELECT {group} AS bucket, sentiment, SUM(interaction_count) AS n FROM interaction_rollups WHERE {' AND '.join(where)} GROUP BY {group}, sentiment"
+
+    conn = get_db_connection()
+    if not conn: raise HTTPException(status_code=503, detail="Database connection failed.")
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+    except MySQLError as e: logger.error("DB error querying rollups: %s", e); raise HTTPException(status_code=500, detail=f"Database error: {e.msg}")
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+    buckets: Dict[Any, Dict[str, int]] = {}
+    for bucket, sentiment, count in rows: buckets.setdefault(bucket, {})[sentiment or "Unknown"] = int(count)
+    by_sentiment = Counter()
+    for counts in buckets.values(): by_sentiment.update(counts)
+    result = {"dimension": dimension, "value": value, "total": sum(by_sentiment.values()), "by_sentiment": dict(by_sentiment)}
+    if series:
+        result["weeks"] = [{"week_start": week, "total": sum(counts.values()), "by_sentiment": counts} for week, counts in sorted(buckets.items())]
+    else:
+        top = heapq.nlargest(limit, buckets.items(), key=lambda item: sum(item[1].values()))
+        result["top"] = [{"value": bucket, "total": sum(counts.values()), "by_sentiment": counts} for bucket, counts in top]
+    return result
+
+# --- Interaction Log Queries ---
+QUERY_PAGE_DEFAULT = int(os.getenv("QUERY_PAGE_DEFAULT", "50"))
+QUERY_PAGE_MAX = int(os.getenv("QUERY_PAGE_MAX", "200"))
+QUERY_LOG_COLUMNS = ["id", "version"] + INTERACTION_LOG_COLUMNS
+
+def encode_query_cursor(row: Dict[str, Any]) -> str:
+    date_value = row["interactionDate"]
+    raw = json.dumps([date_value.isoformat() if date_value else None, row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_query_cursor(cursor_token: str) -> tuple:
+    try:
+        date_value, last_id = json.loads(base64.urlsafe_b64decode(cursor_token + "=" * (-len(cursor_token) % 4)))
+        return (d.fromisoformat(date_value) if date_value else None), int(last_id)
+    except (ValueError, TypeError): raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@db_timed("query_interaction_logs")
+def query_interaction_logs(hcp: Optional[str] = None, date_from: Optional[d] = None, date_to: Optional[d] = None,
+                           sentiment: Optional[str] = None, product: Optional[str] = None, interaction_type: Optional[str] = None,
+                           text: Optional[str] = None, limit: int = QUERY_PAGE_DEFAULT, cursor_token: Optional[str] = None) -> InteractionLogPage:
+    """One page of logs, newest interactionDate first (NULL dates last), with keyset pagination on
+    (interactionDate, id) so deep pages cost the same as the first. Every equality filter has a
+    (column, interactionDate, id) index; child rows for the page come back in a single UNION ALL. Blocking."""
+    where, params = [], []
+    for column, value in (("hcpName", hcp), ("sentiment", sentiment), ("interactionType", interaction_type)):
+        if value: where.append(f"{column} = %s"); params.append(value)
+    if date_from: where.append("interactionDate >= %s"); params.append(date_from)
+    if date_to: where.append("interactionDate <= %s"); params.append(date_to)
+    if product:
+        where.append("EXISTS (SELECT 1 FROM interaction_products_discussed_ai p WHERE p.product_name = %s AND p.interaction_log_id = interaction_logs.id)")
+        params.append(product)
+    if text: where.append("MATCH (topicsDiscussed, outcomes) AGAINST (%s IN BOOLEAN MODE)"); params.append(text)
+    if cursor_token:
+        after_date, after_id = decode_query_cursor(cursor_token)
+        if after_date is None: where.append("(interactionDate IS NULL AND id < %s)"); params.append(after_id)
+        else:
+            where.append("(interactionDate < %s OR (interactionDate = %s AND id < %s) OR interactionDate IS NULL)")
+            params.extend([after_date, after_date, after_id])
+    sql = (f"SELECT {', '.join(QUERY_LOG_COLUMNS)} FROM interaction_logs"
+           + (f" WHERE {' AND '.join(where)}" if where else "")
+           + " ORDER BY interactionDate DESC, id DESC LIMIT %s")
+    params.append(limit + 1)
+
+    conn = get_db_connection()
+    if not conn: raise HTTPException(status_code=503, detail="Database connection failed.")
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        children: Dict[int, Dict[str, list]] = {row["id"]: {table: [] for table in CHILD_TABLES} for row in rows}
+        if rows:
+            ids = [row["id"] for row in rows]
+            in_list = ", ".join(["%s"] * len(ids))
+            cursor.execute(" UNION ALL ".join(
+                f"SELECT '{table}' AS child_table, id, interaction_log_id, {value_column} AS value FROM {table} WHERE interaction_log_id IN ({in_list})"
+                for table, (value_column, _) in CHILD_TABLES.items()) + " ORDER BY id", tuple(ids) * len(CHILD_TABLES))
+            for child in cursor.fetchall():
+                children[child["interaction_log_id"]][child["child_table"]].append(child)
+    except MySQLError as e: logger.error("DB error querying logs: %s", e); raise HTTPException(status_code=500, detail=f"Database error: {e.msg}")
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+    items = []
+    for row in rows:
+        log_children = children[row["id"]]
+        items.append(InteractionLogResponse(
+            id=row["id"], version=row["version"], hcpName=row["hcpName"], interactionType=row["interactionType"],
+            date=row["interactionDate"], time=_stored_value(row["interactionTime"]), attendees=row["attendees"],
+            topicsDiscussed=row["topicsDiscussed"], sentiment=row["sentiment"], outcomes=row["outcomes"],
+            followUpActions=row["followUpActions"], chatSessionId=row["chatSessionId"], idempotencyKey=row["idempotencyKey"],
+            materialsShared=[MaterialItem(id=c["id"], name=c["value"]) for c in log_children["interaction_materials_shared"]],
+            samplesDistributed=[MaterialItem(id=c["id"], name=c["value"]) for c in log_children["interaction_samples_distributed"]],
+            productsDiscussed=[c["value"] for c in log_children["interaction_products_discussed_ai"]]))
+    return InteractionLogPage(items=items, next_cursor=encode_query_cursor(rows[-1]) if has_more else None)
+
+# --- Write-Behind Spool ---
+# Optional: /interactions/log_structured appends the validated log to a local spool, fsyncs it and answers 202
+# right away; a background task drains the spool into the database in batches. Off unless WRITE_BEHIND_ENABLED.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_SPOOL_DIR = os.getenv("WRITE_BEHIND_SPOOL_DIR", "spool")
+WRITE_BEHIND_FSYNC_WINDOW_MS = float(os.getenv("WRITE_BEHIND_FSYNC_WINDOW_MS", "2"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_MAX_BACKOFF_SECONDS = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_SECONDS", "30"))
+WRITE_BEHIND_COMPACT_BYTES = int(os.getenv("WRITE_BEHIND_COMPACT_BYTES", str(64 * 2**20)))
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so only run one worker per spool directory there.
+    fcntl = None
+
+spool_fsync_seconds = Histogram("hcp_spool_fsync_seconds", "Time per spool write + fsync (one per group of appends).")
+spool_drain_seconds = Histogram("hcp_spool_drain_seconds", "Time per batch drained from the spool into the database.")
+
+class WriteBehindSpool:
+    """Durable append-only spool in front of write_interaction_batch().
+
+    spool.log holds one JSON record per line ({"seq", "data"}); spool.ack holds the highest seq that, with every
+    earlier one, has reached the database or spool.dead. Appends are group-committed: everything queued while one
+    write+fsync runs goes out with the next. On start the log is replayed from the ack. Every record carries an
+    idempotencyKey, so a record drained twice (crash between commit and ack) comes back as a duplicate: creates by
+    interaction_logs.idempotencyKey, updates by interaction_log_updates."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.log_path = os.path.join(directory, "spool.log")
+        self.ack_path = os.path.join(directory, "spool.ack")
+        self.dead_path = os.path.join(directory, "spool.dead")
+        self.pending: deque = deque()  # (seq, InteractionLogCreate, attempts), durable and awaiting the database
+        self.in_flight: List[tuple] = []  # the batch currently being written by the drain loop
+        self.done: set = set()         # finished seqs above acked_seq: drained, dead-lettered or never spooled
+        self.dead_letters: Dict[str, str] = {}
+        self.superseded: Dict[str, str] = {}  # coalesced update's key -> key of the later update written in its place
+        self.next_seq, self.acked_seq, self.written_seq = 1, 0, 0
+        self._appends: List[tuple] = []  # (line, seq, data, future) waiting for the next fsync
+        self._append_wakeup, self._drain_wakeup = asyncio.Event(), asyncio.Event()
+        self._file_lock = asyncio.Lock()
+        self._log_file = self._lock_file = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"accepted": 0, "drained": 0, "duplicates": 0, "coalesced": 0, "retries": 0, "dead_lettered": 0,
+                      "db_unavailable": 0, "fsyncs": 0, "replayed": 0}
+
+    def open(self) -> bool:
+        """Locks the spool directory and replays unacknowledged records. Returns False if another worker owns it. Blocking."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "spool.lock"), "w")
+        if fcntl:
+            try: fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError: self._lock_file.close(); self._lock_file = None; return False
+        if os.path.exists(self.ack_path):
+            with open(self.ack_path) as f: self.acked_seq = int(f.read().strip() or 0)
+        self.next_seq = self.written_seq = self.acked_seq
+        good_bytes = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        data = InteractionLogCreate.model_validate(record["data"])
+                    except (ValueError, KeyError, ValidationError):
+                        logger.warning("Spool %s: dropping torn record after byte %d", self.log_path, good_bytes)
+                        break
+                    good_bytes += len(line)
+                    self.written_seq = max(self.written_seq, record["seq"])
+                    if record["seq"] > self.acked_seq: self.pending.append((record["seq"], data, 0))
+            os.truncate(self.log_path, good_bytes)
+        self.next_seq = self.written_seq + 1
+        self.stats["replayed"] = len(self.pending)
+        self._log_file = open(self.log_path, "ab", buffering=0)  # unbuffered: a failed write must not linger in a buffer
+        if self.pending: logger.info("Write-behind: replaying %d spooled logs from %s", len(self.pending), self.log_path)
+        return True
+
+    async def start(self) -> bool:
+        if not await run_in_threadpool(self.open): return False
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._drain_loop())]
+        if self.pending: self._drain_wakeup.set()
+        return True
+
+    async def stop(self):
+        while self._appends: await asyncio.sleep(0.005)  # let in-flight appends reach the disk
+        for task in self._tasks: task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._log_file: self._log_file.close()
+        if self._lock_file: self._lock_file.close()
+
+    def queue_depth(self) -> int: return len(self.pending) + len(self.in_flight) + len(self._appends)
+
+    def snapshot(self) -> Dict[str, Any]:
+        spool_bytes = os.fstat(self._log_file.fileno()).st_size if self._log_file and not self._log_file.closed else 0
+        return {**self.stats, "queue_depth": self.queue_depth(), "acked_seq": self.acked_seq, "spool_bytes": spool_bytes}
+
+    def status_of(self, accepted_id: str) -> Optional[str]:
+        accepted_id = self.superseded.get(accepted_id, accepted_id)
+        if accepted_id in self.dead_letters: return "dead_lettered"
+        queued = chain(self.pending, self.in_flight, ((seq, data, 0) for _, seq, data, _ in self._appends))
+        return "queued" if any(data.idempotencyKey == accepted_id for _, data, _ in queued) else None
+
+    async def append(self, data: InteractionLogCreate) -> str:
+        """Returns the accepted id once the record is on disk. Raises OSError if the spool cannot be written."""
+        if not data.idempotencyKey: data = data.model_copy(update={"idempotencyKey": uuid.uuid4().hex})
+        seq, self.next_seq = self.next_seq, self.next_seq + 1
+        future = asyncio.get_running_loop().create_future()
+        self._appends.append((json.dumps({"seq": seq, "data": data.model_dump(mode="json")}) + "\n", seq, data, future))
+        self._append_wakeup.set()
+        await future
+        return data.idempotencyKey
+
+    def _write_and_sync(self, payload: bytes):
+        """Appends and fsyncs `payload`; on failure cuts the log back so no partial record stays in front of later ones."""
+        fd = self._log_file.fileno()
+        good_size = os.fstat(fd).st_size
+        try:
+            with timed(spool_fsync_seconds):
+                view = memoryview(payload)
+                while view: view = view[self._log_file.write(view):]
+                os.fsync(fd)
+        except OSError:
+            try: os.ftruncate(fd, good_size)
+            except OSError as e: logger.error("Write-behind: could not cut spool back after a failed write: %s", e)
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await self._append_wakeup.wait()
+            if WRITE_BEHIND_FSYNC_WINDOW_MS: await asyncio.sleep(WRITE_BEHIND_FSYNC_WINDOW_MS / 1000)
+            self._append_wakeup.clear()
+            batch, self._appends = self._appends, []
+            if not batch: continue
+            try:
+                async with self._file_lock:
+                    await run_in_threadpool(self._write_and_sync, "".join(line for line, _, _, _ in batch).encode())
+                    self.written_seq = batch[-1][1]
+            except OSError as e:
+                logger.error("Write-behind spool write failed: %s", e)
+                # The callers save synchronously instead; mark the seqs done so the ack does not stall at this gap.
+                self.done.update(seq for _, seq, _, _ in batch)
+                for _, _, _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                self._drain_wakeup.set()
+                continue
+            self.stats["fsyncs"] += 1; self.stats["accepted"] += len(batch)
+            for _, seq, data, future in batch:
+                self.pending.append((seq, data, 0))
+                if not future.done(): future.set_result(seq)
+            self._drain_wakeup.set()
+
+    def _coalesce(self, batch: List[tuple]) -> List[tuple]:
+        # Full-state updates to the same log: only the last one in a batch needs writing.
+        last_update = {data.id: (seq, data) for seq, data, _ in batch if data.id is not None}
+        kept = [entry for entry in batch if entry[1].id is None or last_update[entry[1].id][0] == entry[0]]
+        for seq, data, _ in batch:
+            if data.id is None or last_update[data.id][0] == seq: continue
+            self.superseded[data.idempotencyKey] = last_update[data.id][1].idempotencyKey
+            self.done.add(seq); self.stats["coalesced"] += 1
+        return kept
+
+    def _dead_letter(self, seq: int, data: InteractionLogCreate, error: str):
+        with open(self.dead_path, "a") as f:
+            f.write(json.dumps({"seq": seq, "error": error, "data": data.model_dump(mode="json")}) + "\n")
+            f.flush(); os.fsync(f.fileno())
+
+    def _write_ack(self, acked_seq: int):
+        tmp_path = self.ack_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(acked_seq)); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, self.ack_path)
+
+    async def _advance_ack(self):
+        acked = self.acked_seq
+        while acked + 1 in self.done: acked += 1
+        if acked == self.acked_seq: return
+        await run_in_threadpool(self._write_ack, acked)
+        self.done.difference_update(range(self.acked_seq + 1, acked + 1))
+        self.acked_seq = acked
+
+    async def _drain_loop(self):
+        backoff = 0.0
+        while True:
+            await self._advance_ack()
+            if not self.pending:
+                if not self._appends and self.acked_seq >= self.written_seq: await self._compact()
+                if self.pending: continue
+                self._drain_wakeup.clear()
+                await self._drain_wakeup.wait()
+                continue
+            # Records that already failed once go one at a time, so a bad record cannot take its neighbours down with it.
+            size = 1 if self.pending[0][2] else WRITE_BEHIND_BATCH_SIZE
+            batch = self.in_flight = [self.pending.popleft() for _ in range(min(len(self.pending), size))]
+            to_write = self._coalesce(batch)
+            try:
+                with timed(spool_drain_seconds):
+                    results = await run_in_threadpool(write_interaction_batch, [(seq, data) for seq, data, _ in to_write]) if to_write else []
+            except Exception as e:
+                # Only transient database errors are waited out; anything else (a bug, bad data) is charged to the records.
+                retryable = isinstance(e, MySQLError) and is_transient_db_error(e)
+                if retryable: logger.warning("Write-behind drain hit a transient database error: %s", e)
+                else: logger.exception("Write-behind drain failed: %s", e)
+                results = [BatchItemResult(index=seq, status="failed", error=f"{type(e).__name__}: {e}", retryable=retryable) for seq, _, _ in to_write]
+            if results and all(r.status == "failed" and r.retryable for r in results):
+                # Database unreachable: keep everything, in order, and back off without spending attempts.
+                self.pending.extendleft(reversed(to_write)); self.in_flight = []
+                self.stats["db_unavailable"] += 1
+                backoff = min(WRITE_BEHIND_MAX_BACKOFF_SECONDS, max(0.5, backoff * 2))
+                logger.warning("Write-behind: database unavailable, %d logs queued; retrying in %.1fs", self.queue_depth(), backoff)
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                continue
+            backoff = 0.0
+            by_seq = {r.index: r for r in results}
+            retry = []
+            for seq, data, attempts in to_write:
+                result = by_seq.get(seq)
+                if result is not None and result.status != "failed":
+                    self.done.add(seq)
+                    self.stats["duplicates" if result.status == "duplicate" else "drained"] += 1
+                elif result is not None and result.retryable:
+                    retry.append((seq, data, attempts)); self.stats["retries"] += 1  # deadlock / lost connection: not charged
+                elif attempts + 1 >= WRITE_BEHIND_MAX_ATTEMPTS:
+                    error = result.error if result else "missing result"
+                    await run_in_threadpool(self._dead_letter, seq, data, error)
+                    self.dead_letters[data.idempotencyKey] = error
+                    self.done.add(seq); self.stats["dead_lettered"] += 1
+                    logger.error("Write-behind: log %s dead-lettered after %d attempts: %s", data.idempotencyKey, attempts + 1, error)
+                else:
+                    retry.append((seq, data, attempts + 1)); self.stats["retries"] += 1
+            self.in_flight = []
+            if retry:
+                self.pending.extendleft(reversed(retry))
+                await asyncio.sleep(min(WRITE_BEHIND_MAX_BACKOFF_SECONDS, 0.1 * 2 ** max(attempts for _, _, attempts in retry)))
+
+    async def _compact(self):
+        async with self._file_lock:
+            if self.acked_seq < self.written_seq or os.fstat(self._log_file.fileno()).st_size < WRITE_BEHIND_COMPACT_BYTES: return
+            await run_in_threadpool(self._log_file.truncate, 0)
+            logger.info("Write-behind: spool compacted at seq %d", self.acked_seq)
+
+write_behind: Optional[WriteBehindSpool] = None
+
 # --- LangGraph Agent Setup ---
 
 class InteractionAgentState(TypedDict):
@@ -97,12 +1104,18 @@ class InteractionAgentState(TypedDict):
     last_llm_parsed_json: Optional[Dict[str, Any]]
     tool_output: Optional[str] 
     current_action_type: Optional[str] 
+    conversation_summary: Optional[str]
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemma2-9b-it")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Bounds in-flight Groq calls per worker; excess turns wait here instead of piling onto the API.
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
 try:
     groq_api_key_env = os.environ.get("GROQ_API_KEY")
-    if not groq_api_key_env: print("WARNING: GROQ_API_KEY not found."); groq_client = None
-    else: groq_client = Groq(api_key=groq_api_key_env)
-except Exception as e: print(f"Error initializing Groq client: {e}"); groq_client = None
+    if not groq_api_key_env: logger.warning("GROQ_API_KEY not found."); groq_client = None
+    else: groq_client = AsyncGroq(api_key=groq_api_key_env, base_url=os.getenv("GROQ_BASE_URL") or None)
+except Exception as e: logger.error("Error initializing Groq client: %s", e); groq_client = None
 
 # --- MODIFIED LLM_SYSTEM_PROMPT with all tool types ---
 LLM_SYSTEM_PROMPT = (
@@ -125,16 +1138,62 @@ LLM_SYSTEM_PROMPT = (
     "Only include fields if clearly present. If no specific fields for EXTRACT_INFO, 'extracted_fields' can be {}. "
     "Date format YYYY-MM-DD, Time format HH:MM (24h)."
 )
+LLM_SYSTEM_PROMPT_HASH = hashlib.sha256(LLM_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+# --- Tool Functions ---
+# Blocking (DB) - invoked through cached_tool_call(), which runs them in the threadpool.
+# Lookups accept a name only when every query token matches it and the mean token similarity reaches this;
+# anything weaker gets a "did you mean" reply instead of some other HCP's profile.
+HCP_MATCH_MIN_SCORE = 0.5
+# Checked in order, so "contraindications" is matched before "indications".
+PRODUCT_QUERY_COLUMNS = [
+    ("side effect", "common_side_effects", "Common side effects"), ("contraindicat", "contraindications", "Contraindications"),
+    ("indicat", "indications", "Indications"), ("dos", "standard_dosage", "Dosage"), ("efficac", "efficacy_summary", "Efficacy"),
+    ("mechanism", "mechanism_of_action", "Mechanism of action"),
+]
+
+@db_timed("tool_lookup")
+def fetch_one(sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    if not conn: return None
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+    except MySQLError as e:
+        logger.error("DB error in tool lookup: %s", e)
+        return None
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+class UncachedToolResult(str):
+    """Tool output that cached_tool_call() must not store, e.g. because the database was unreachable."""
+
+def _close_alternatives(matches: List[tuple]) -> str:
+    others = [name for _, name, score in matches[1:] if matches[0][2] - score <= 0.05]
+    return f" Other close matches: {', '.join(others)}." if others else ""
+
+def _did_you_mean(index: "TrigramNameIndex", query: str) -> str:
+    suggestions = [name for _, name, score in index.search(query, limit=3) if score >= HCP_MATCH_MIN_SCORE]
+    return f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
 
-# --- Tool Functions (Placeholders) ---
 def run_retrieve_hcp_profile_tool(hcp_name: Optional[str]) -> str:
-    print(f"--- TOOL CALLED: Retrieve HCP Profile for: {hcp_name} ---")
+    logger.debug("Tool retrieve_hcp_profile called for %r", hcp_name)
     if not hcp_name:
         return "To retrieve an HCP profile, please tell me the HCP's name."
-    return f"Simulated profile for {hcp_name}: Specialty - Cardiology, Institution - City General"
+    matches = hcp_name_index.search(hcp_name, limit=3, require_all_tokens=True)
+    if not matches or matches[0][2] < HCP_MATCH_MIN_SCORE:
+        return f"I couldn't find an HCP matching '{hcp_name}'.{_did_you_mean(hcp_name_index, hcp_name)}"
+    profile = fetch_one("SELECT name, specialty, institution, city FROM hcps WHERE id = %s", (matches[0][0],))
+    if not profile:
+        return UncachedToolResult(f"The profile for {matches[0][1]} is unavailable right now.")
+    return (f"Profile for {profile['name']}: Specialty - {profile['specialty'] or 'n/a'}, "
+            f"Institution - {profile['institution'] or 'n/a'}, City - {profile['city'] or 'n/a'}.{_close_alternatives(matches)}")
 
 def run_suggest_next_action_tool(hcp_name: Optional[str] = None) -> str:
-    print(f"--- TOOL CALLED: Suggest Next Best Action (Context HCP: {hcp_name}) ---")
+    logger.debug("Tool suggest_next_action called (context HCP: %r)", hcp_name)
     suggestions = [
         "Schedule a follow-up meeting in 2 weeks to discuss trial results.",
         "Send the latest OncoBoost Phase III PDF.",
@@ -145,25 +1204,553 @@ def run_suggest_next_action_tool(hcp_name: Optional[str] = None) -> str:
     return f"Here are some general next best actions: {suggestions[1]}"
 
 def run_query_product_info_tool(product_name: Optional[str], query_details: Optional[str]) -> str:
-    print(f"--- TOOL CALLED: Query Product Info for: {product_name}, Details: {query_details} ---")
+    logger.debug("Tool query_product_info called for %r, details: %r", product_name, query_details)
     if not product_name:
         return "Which product are you asking about?"
     if not query_details: # If query_details is general, LLM might have to infer or this tool can ask.
         return f"What specifically about {product_name} would you like to know (e.g., dosage, side effects, efficacy data)?"
-    return f"Simulated info for {product_name} regarding '{query_details}': Standard dose is 10mg daily. Clinical trials show 75% efficacy in target population. Common side effects include mild nausea."
+    matches = product_name_index.search(product_name, limit=3, require_all_tokens=True)
+    if not matches or matches[0][2] < HCP_MATCH_MIN_SCORE:
+        return f"I don't have information on a product called '{product_name}'.{_did_you_mean(product_name_index, product_name)}"
+    product = fetch_one("SELECT * FROM products WHERE id = %s", (matches[0][0],))
+    if not product:
+        return UncachedToolResult(f"Information on {matches[0][1]} is unavailable right now.")
+    details = query_details.lower()
+    for keyword, column, label in PRODUCT_QUERY_COLUMNS:
+        if keyword in details:
+            return f"{label} for {product['name']}: {product[column] or 'not on file'}."
+    return (f"{product['name']} ({product['therapeutic_area'] or 'n/a'}): indicated for {product['indications'] or 'n/a'}. "
+            f"Standard dose: {product['standard_dosage'] or 'n/a'}.")
+
+
+# --- Response Caches ---
+# Layer 1 caches raw LLM output per (system prompt, model, normalized user message) for context-free turns
+# only; layer 2 caches tool results per (tool, arguments). Both are bounded LRUs with TTLs and hit/miss counters.
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Only context-free answers are reused; EXTRACT_INFO / EDIT_FIELD depend on the session. A reply is also only
+# stored when every entity argument (LLM_CACHE_LITERAL_ARGS) appears verbatim in the user message.
+LLM_CACHEABLE_ACTIONS = {"RETRIEVE_HCP_PROFILE", "QUERY_PRODUCT_INFO", "SUGGEST_NEXT_ACTION", "GENERAL_QUERY"}
+LLM_CACHE_LITERAL_ARGS = ("hcp_name", "product_name")
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000"))
+TOOL_CACHE_TTLS = {"retrieve_hcp_profile": 900, "query_product_info": 3600, "suggest_next_action": 300}
+
+class LRUCache:
+    """Thread-safe LRU with per-entry TTL. Tool lookups may run in the threadpool, hence the lock."""
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0; self.misses = 0; self.evictions = 0; self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None: del self._data[key]; self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl_seconds: float):
+        if ttl_seconds <= 0 or self.max_entries <= 0: return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False); self.evictions += 1
+
+    def invalidate(self, predicate=None) -> int:
+        with self._lock:
+            keys = [k for k in self._data if predicate is None or predicate(k)]
+            for k in keys: del self._data[k]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._data), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0, "evictions": self.evictions, "invalidations": self.invalidations}
+
+llm_response_cache = LRUCache("llm", LLM_CACHE_MAX_ENTRIES)
+tool_result_cache = LRUCache("tool", TOOL_CACHE_MAX_ENTRIES)
+
+def normalize_cache_message(message: str) -> str:
+    return re.sub(r"\s+", " ", message).strip().rstrip("?.! ").lower()
+
+def llm_cache_key(user_message: str) -> str:
+    # The prompt hash is part of every key, so editing LLM_SYSTEM_PROMPT orphans all old entries.
+    return hashlib.sha256(f"{LLM_SYSTEM_PROMPT_HASH}|{LLM_MODEL}|{normalize_cache_message(user_message)}".encode("utf-8")).hexdigest()
+
+def llm_reply_cacheable(parsed_llm_output: Dict[str, Any], user_message: str) -> bool:
+    action_details = parsed_llm_output.get("action_details") or {}
+    if action_details.get("type") not in LLM_CACHEABLE_ACTIONS: return False
+    message = normalize_cache_message(user_message)
+    return all(normalize_cache_message(str(action_details[arg])) in message for arg in LLM_CACHE_LITERAL_ARGS if action_details.get(arg))
+
+async def cached_tool_call(tool_name: str, tool_fn, *args) -> str:
+    key = (tool_name,) + tuple(normalize_cache_message(a) if isinstance(a, str) else a for a in args)
+    cached = tool_result_cache.get(key)
+    if cached is not None: return cached
+    result = await run_in_threadpool(tool_fn, *args)
+    if not isinstance(result, UncachedToolResult): tool_result_cache.put(key, result, TOOL_CACHE_TTLS.get(tool_name, 0))
+    return result
+
+def invalidate_tool_cache(tool_name: Optional[str] = None) -> int:
+    """Hook for when underlying HCP / product data changes; drops one tool's entries or all of them."""
+    return tool_result_cache.invalidate(None if tool_name is None else (lambda key: key[0] == tool_name))
+
+# --- HCP / Product Name Index ---
+# In-memory fuzzy name lookup so tools can resolve "Dr Smyth" without a LIKE '%..%' scan.
+# Only distinct name *tokens* are indexed fuzzily; token postings then map them to entity ids.
+# Candidate tokens come from a one-deletion neighbourhood ("smyth" and "smith" both reduce to
+# "smth"), which is a handful of dict hits; heavier misspellings fall back to trigram counting.
+# Candidates are always ranked by trigram (Dice) similarity.
+HCP_INDEX_REFRESH_SECONDS = int(os.getenv("HCP_INDEX_REFRESH_SECONDS", "60"))
+NAME_INDEX_MIN_TOKEN_SIMILARITY = 0.4
+_NAME_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NAME_STOPWORDS = {"dr", "doctor", "prof", "professor", "mr", "mrs", "ms", "md", "the"}
+
+def _name_tokens(name: str) -> List[str]:
+    return [tok for tok in _NAME_TOKEN_RE.findall((name or "").lower()) if tok not in _NAME_STOPWORDS]
 
+def _deletions(token: str) -> set:
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def _trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramNameIndex:
+    def __init__(self):
+        self.names: Dict[int, str] = {}                 # entity id -> display name
+        self._entity_tokens: Dict[int, List[str]] = {}
+        self._token_postings: Dict[str, set] = {}       # token -> entity ids
+        self._token_trigrams: Dict[str, set] = {}       # token -> its trigram set
+        self._trigram_postings: Dict[str, set] = {}     # trigram -> tokens
+        self._deletion_postings: Dict[str, tuple] = {}  # token minus one char -> tokens (tuples: mostly 1 entry)
+        self._lock = threading.Lock()
+        self.last_refreshed_at = None
+
+    def __len__(self): return len(self.names)
+
+    def upsert(self, entity_id: int, name: str) -> bool:
+        """Adds or renames an entity; returns False when it was already indexed under this name."""
+        with self._lock:
+            if self.names.get(entity_id) == name: return False
+            self._remove_locked(entity_id)
+            tokens = _name_tokens(name)
+            self.names[entity_id] = name
+            self._entity_tokens[entity_id] = tokens
+            for token in tokens:
+                if token not in self._token_postings:
+                    self._token_postings[token] = set()
+                    grams = _trigrams(token)
+                    self._token_trigrams[token] = grams
+                    for gram in grams: self._trigram_postings.setdefault(gram, set()).add(token)
+                    for variant in _deletions(token): self._deletion_postings[variant] = self._deletion_postings.get(variant, ()) + (token,)
+                self._token_postings[token].add(entity_id)
+            return True
+
+    def remove(self, entity_id: int):
+        with self._lock: self._remove_locked(entity_id)
+
+    def _remove_locked(self, entity_id: int):
+        for token in self._entity_tokens.pop(entity_id, []):
+            postings = self._token_postings.get(token)
+            if postings is None: continue
+            postings.discard(entity_id)
+            if not postings:
+                del self._token_postings[token]
+                for gram in self._token_trigrams.pop(token, ()):
+                    self._trigram_postings[gram].discard(token)
+                for variant in _deletions(token):
+                    remaining = tuple(t for t in self._deletion_postings.get(variant, ()) if t != token)
+                    if remaining: self._deletion_postings[variant] = remaining
+                    else: self._deletion_postings.pop(variant, None)
+        self.names.pop(entity_id, None)
+
+    def _similar_tokens(self, token: str, limit: int = 20) -> List[tuple]:
+        if token in self._token_postings: return [(token, 1.0)]
+        grams = _trigrams(token)
+        close = set(chain.from_iterable(self._deletion_postings.get(variant, ()) for variant in _deletions(token)))
+        if close:
+            scored = [(c, 2 * len(grams & self._token_trigrams[c]) / (len(grams) + len(self._token_trigrams[c]))) for c in close]
+            return heapq.nlargest(limit, scored, key=lambda item: item[1])
+        shared = Counter(chain.from_iterable(self._trigram_postings.get(gram, ()) for gram in grams))
+        # Dice >= t needs at least t*|grams|/(2-t) shared trigrams; skip anything below that cheaply.
+        min_shared = NAME_INDEX_MIN_TOKEN_SIMILARITY * len(grams) / (2 - NAME_INDEX_MIN_TOKEN_SIMILARITY)
+        scored = []
+        for candidate, count in shared.items():
+            if count < min_shared: continue
+            similarity = 2 * count / (len(grams) + len(self._token_trigrams[candidate]))
+            if similarity >= NAME_INDEX_MIN_TOKEN_SIMILARITY: scored.append((candidate, similarity))
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+
+    def search(self, query: str, limit: int = 5, require_all_tokens: bool = False) -> List[tuple]:
+        """Returns up to `limit` (entity_id, name, score) tuples, best first; score is in [0, 1]. With
+        require_all_tokens, only names in which every query token matches some name token (at
+        NAME_INDEX_MIN_TOKEN_SIMILARITY or better) are returned, so "Evelyn Carter" cannot hit "Evelyn Hayes"."""
+        query_tokens = _name_tokens(query)
+        if not query_tokens: return []
+        with self._lock:
+            matches = [dict(self._similar_tokens(token)) for token in query_tokens]
+            if require_all_tokens and not all(matches): return []
+            matches = [m for m in matches if m]
+            if not matches: return []
+            n = len(query_tokens)
+
+            def score(entity_id: int) -> tuple:
+                tokens = self._entity_tokens[entity_id]
+                best = [max(m.get(token, 0.0) for token in tokens) for m in matches]
+                if require_all_tokens and min(best) < NAME_INDEX_MIN_TOKEN_SIMILARITY: return -1.0, 0.0  # dropped below
+                mean = sum(best) / n
+                # Extra name tokens only break ties when ranking ("Hayes" prefers "Dr. Hayes" over "Dr. Evelyn Hayes");
+                # the reported score stays the mean token similarity that callers compare with their thresholds.
+                return mean - 0.01 * max(len(tokens) - n, 0), mean
+
+            # Every entity holding a token close to *any* query token is a candidate, so "Marcus Hayes" reaches the
+            # Hayes entries even when "marcus" is the more selective token. Matched tokens are expanded best first
+            # (threshold-style): entities sharing another query token are found with set intersections and scored,
+            # entities matching this token alone all score the same, so `limit` of them suffice. The walk stops once
+            # the k-th best score reaches what an entity holding none of the expanded tokens could still score.
+            scored: Dict[int, tuple] = {}
+            pending = [sorted(m.items(), key=lambda item: item[1], reverse=True) for m in matches]
+            while any(pending):
+                reachable = sum(p[0][1] for p in pending if p) / n
+                if len(scored) >= limit and heapq.nlargest(limit, scored.values())[-1][0] >= reachable: break
+                i = max((i for i, p in enumerate(pending) if p), key=lambda i: pending[i][0][1])
+                token, _ = pending[i].pop(0)
+                postings = self._token_postings[token]
+                for j, m in enumerate(matches):
+                    if j == i: continue
+                    for other_token in m:
+                        for entity_id in postings & self._token_postings[other_token]:
+                            if entity_id not in scored: scored[entity_id] = score(entity_id)
+                if require_all_tokens and len(matches) > 1: continue  # the rest match this query token only
+                # Prefer entities without extra name tokens; others only fill up what is left.
+                filled, extra = 0, []
+                for entity_id in postings:
+                    if entity_id in scored: continue
+                    if len(self._entity_tokens[entity_id]) <= n:
+                        scored[entity_id] = score(entity_id); filled += 1
+                        if filled == limit: break
+                    elif len(extra) < limit: extra.append(entity_id)
+                else:
+                    for entity_id in extra[:limit - filled]: scored[entity_id] = score(entity_id)
+            top = heapq.nlargest(limit, scored.items(), key=lambda item: item[1])
+            return [(entity_id, self.names[entity_id], round(mean, 4)) for entity_id, (key, mean) in top if key > -1.0]
+
+hcp_name_index = TrigramNameIndex()
+product_name_index = TrigramNameIndex()
+
+@db_timed("refresh_name_indexes")
+def refresh_name_indexes(full: bool = False) -> Dict[str, int]:
+    """Loads hcps/products rows changed since the last refresh into the in-memory indexes and drops
+    affected tool cache entries. full=True (and the first call) rebuilds from scratch and swaps the
+    index in, which is also how deleted rows disappear. Blocking."""
+    global hcp_name_index, product_name_index
+    conn = get_db_connection()
+    if not conn: logger.warning("Name indexes not refreshed (no DB connection)."); return {"hcps": 0, "products": 0}
+    cursor = None; changed = {"hcps": 0, "products": 0}
+    try:
+        cursor = conn.cursor()
+        for table, tool_name in (("hcps", "retrieve_hcp_profile"), ("products", "query_product_info")):
+            current = hcp_name_index if table == "hcps" else product_name_index
+            rebuild = full or current.last_refreshed_at is None
+            index = TrigramNameIndex() if rebuild else current
+            if rebuild: cursor.execute(f"SELECT id, name, updated_at FROM {table}")
+            # >= because updated_at has one-second resolution; unchanged rows are skipped by upsert().
+            else: cursor.execute(f"SELECT id, name, updated_at FROM {table} WHERE updated_at >= %s", (current.last_refreshed_at,))
+            for entity_id, name, updated_at in cursor.fetchall():
+                if index.upsert(entity_id, name): changed[table] += 1
+                if index.last_refreshed_at is None or updated_at > index.last_refreshed_at: index.last_refreshed_at = updated_at
+            if rebuild:
+                if table == "hcps": hcp_name_index = index
+                else: product_name_index = index
+            if changed[table]: invalidate_tool_cache(tool_name)
+        return changed
+    except MySQLError as e:
+        logger.error("DB error refreshing name indexes: %s", e)
+        return changed
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+async def name_index_refresh_loop():
+    while True:
+        await asyncio.sleep(HCP_INDEX_REFRESH_SECONDS)
+        await run_in_threadpool(refresh_name_indexes)
+
+# --- Fast-Path Pre-Router ---
+# Resolves unambiguous EDIT_FIELD / RETRIEVE_HCP_PROFILE / QUERY_PRODUCT_INFO turns with rules so
+# they never reach Groq. Anything below FAST_PATH_MIN_CONFIDENCE falls through to call_llm.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+FAST_PATH_EDITABLE_FIELDS = {
+    "sentiment": "sentiment", "date": "date", "interaction date": "date", "time": "time", "interaction time": "time",
+    "hcp": "hcpName", "hcp name": "hcpName", "doctor": "hcpName", "interaction type": "interactionType", "type": "interactionType",
+    "outcome": "outcomes", "outcomes": "outcomes", "follow up": "followUpActions", "follow-up": "followUpActions",
+    "follow up actions": "followUpActions", "follow-up actions": "followUpActions", "topics": "topicsDiscussed",
+    "topics discussed": "topicsDiscussed", "attendees": "attendees",
+}
+_FIELD_ALTERNATION = "|".join(re.escape(f) for f in sorted(FAST_PATH_EDITABLE_FIELDS, key=len, reverse=True))
+FAST_PATH_EDIT_RE = re.compile(
+    rf"^\s*(?:please\s+)?(?:change|set|update|make)\s+(?:the\s+)?(?P<field>{_FIELD_ALTERNATION})\s+(?:to|as|=)\s+(?P<value>.+?)\s*[.!]?\s*$", re.IGNORECASE)
+FAST_PATH_PROFILE_RE = re.compile(
+    r"^\s*(?:please\s+)?(?:get|show|pull up|retrieve|fetch|look up|lookup)\s+(?:me\s+)?(?:the\s+)?(?:hcp\s+)?profile\s+(?:for|of|on)\s+(?P<name>.+?)\s*[.?!]?\s*$", re.IGNORECASE)
+FAST_PATH_PRODUCT_DETAIL_RE = re.compile(
+    r"\b(?P<detail>side[- ]effects?|dosage|dose|dosing|efficacy(?: data)?|contraindications?|interactions|indications?|mechanism of action|pricing|price)\b", re.IGNORECASE)
+FAST_PATH_QUESTION_RE = re.compile(r"^\s*(?:what|what's|whats|tell me|show me|give me|list|how|any|side|dosage|dose|efficacy|contraindication|indication|pricing|price)\b|\?\s*$", re.IGNORECASE)
+# Logging language means the rep is describing an interaction, not asking a question.
+FAST_PATH_LOGGING_RE = re.compile(r"\b(?:met|meeting|discussed|visited|talked|spoke|shared|gave|left|called|saw)\b", re.IGNORECASE)
+# "call in 2 weeks and sentiment to negative": the value names another field or chains another edit, so it is
+# a compound request that the LLM splits into separate edits.
+FAST_PATH_COMPOUND_RE = re.compile(
+    rf"\b(?:{_FIELD_ALTERNATION})\s*(?:(?:to|as)\b|=)|(?:\b(?:and|also|then)\b|[,;])\s*(?:then\s+|also\s+)?(?:change|set|update|make)\b", re.IGNORECASE)
+_HONORIFIC_RE = re.compile(r"^(?:dr|doctor|prof|professor)\.?\s+", re.IGNORECASE)
+
+fast_path_stats: Dict[str, Any] = {"turns": 0, "served": 0, "fallbacks": 0, "by_action": {}}
+
+class Gazetteer:
+    """Compiled, case-insensitive alternation over known names; honorifics are optional when matching."""
+    def __init__(self, names: List[str]):
+        self.canonical: Dict[str, str] = {}
+        for name in names:
+            key = self._key(name)
+            if key: self.canonical.setdefault(key, name.strip())
+        self._pattern = None
+
+    @property
+    def pattern(self):
+        # Compiled on first search; the HCP gazetteer is only used for exact lookups and can be large.
+        if self._pattern is None and self.canonical:
+            alternation = "|".join(re.escape(k) for k in sorted(self.canonical, key=len, reverse=True))
+            self._pattern = re.compile(rf"\b(?:(?:dr|doctor|prof|professor)\.?\s+)?({alternation})\b", re.IGNORECASE)
+        return self._pattern
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return re.sub(r"\s+", " ", _HONORIFIC_RE.sub("", (name or "").strip())).lower()
+
+    def exact(self, name: str) -> Optional[str]:
+        return self.canonical.get(self._key(name))
+
+    def search(self, text: str) -> Optional[str]:
+        if not self.pattern: return None
+        match = self.pattern.search(text)
+        return self.canonical.get(match.group(1).lower()) if match else None
+
+hcp_gazetteer = Gazetteer([])
+product_gazetteer = Gazetteer([])
+
+@db_timed("load_fast_path_gazetteers")
+def load_fast_path_gazetteers():
+    """Builds the HCP and product gazetteers from names already known to the DB (blocking)."""
+    global hcp_gazetteer, product_gazetteer
+    conn = get_db_connection()
+    if not conn: logger.warning("Fast-path gazetteers not loaded (no DB connection)."); return
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM hcps UNION SELECT DISTINCT hcpName FROM interaction_logs WHERE hcpName IS NOT NULL")
+        hcp_gazetteer = Gazetteer([row[0] for row in cursor.fetchall()])
+        cursor.execute("SELECT name FROM products UNION SELECT DISTINCT product_name FROM interaction_products_discussed_ai")
+        product_gazetteer = Gazetteer([row[0] for row in cursor.fetchall()])
+        logger.info("Fast-path gazetteers loaded: %d HCPs, %d products", len(hcp_gazetteer.canonical), len(product_gazetteer.canonical))
+    except MySQLError as e: logger.error("DB error loading fast-path gazetteers: %s", e)
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+def _normalize_edit_value(field: str, value: str):
+    """Returns (normalized_value, confidence) for a fast-path EDIT_FIELD."""
+    value = value.strip().strip("\"'")
+    if FAST_PATH_COMPOUND_RE.search(value): return value, 0.0
+    if field == "sentiment":
+        lowered = value.lower()
+        return (lowered.capitalize(), 1.0) if lowered in ("positive", "neutral", "negative") else (value, 0.0)
+    if field == "date":
+        if value.lower() == "today": return d.today().isoformat(), 1.0
+        if value.lower() == "yesterday": return (d.today() - timedelta(days=1)).isoformat(), 1.0
+        if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value): return value, 0.0
+        try: return d.fromisoformat(value).isoformat(), 1.0
+        except ValueError: return value, 0.0  # e.g. 2024-02-30
+    if field == "time":
+        if not re.fullmatch(r"\d{2}:\d{2}(:\d{2})?", value): return value, 0.0
+        try: return t.fromisoformat(value).strftime("%H:%M"), 1.0
+        except ValueError: return value, 0.0  # e.g. 99:99
+    if field == "hcpName":
+        return (hcp_gazetteer.exact(value) or value, 0.9)
+    return value, 0.9
+
+def classify_fast_path(message: str) -> Optional[Dict[str, Any]]:
+    """Returns an LLM-shaped parsed response for a confidently recognised intent, else None."""
+    match = FAST_PATH_EDIT_RE.match(message)
+    if match:
+        field = FAST_PATH_EDITABLE_FIELDS[match.group("field").lower()]
+        value, confidence = _normalize_edit_value(field, match.group("value"))
+        if confidence >= FAST_PATH_MIN_CONFIDENCE:
+            return {"conversational_reply": f"Updated {field} to {value}.",
+                    "action_details": {"type": "EDIT_FIELD", "field_to_edit": field, "new_value": value}}
+        return None
+    match = FAST_PATH_PROFILE_RE.match(message)
+    if match:
+        hcp_name = hcp_gazetteer.exact(match.group("name"))
+        if hcp_name:
+            return {"conversational_reply": f"Here is the profile for {hcp_name}.",
+                    "action_details": {"type": "RETRIEVE_HCP_PROFILE", "hcp_name": hcp_name}}
+        return None
+    if len(message.split()) <= 12 and FAST_PATH_QUESTION_RE.search(message) and not FAST_PATH_LOGGING_RE.search(message):
+        product_name = product_gazetteer.search(message)
+        detail = FAST_PATH_PRODUCT_DETAIL_RE.search(message)
+        if product_name and detail:
+            return {"conversational_reply": f"Looking up {detail.group('detail').lower()} for {product_name}.",
+                    "action_details": {"type": "QUERY_PRODUCT_INFO", "product_name": product_name, "query_details": detail.group("detail").lower()}}
+    return None
+
+# --- Incremental parsing of streamed LLM JSON ---
+class IncrementalLLMJSONParser:
+    """Consumes the raw LLM output chunk by chunk and yields (a) newly decoded characters of
+    'conversational_reply' and (b) members of 'action_details.extracted_fields' as soon as each
+    value is syntactically complete. Tolerates ```json fences since it only scans for keys."""
+    _REPLY_KEY = re.compile(r'"conversational_reply"\s*:\s*"')
+    _FIELDS_KEY = re.compile(r'"extracted_fields"\s*:\s*\{')
+
+    def __init__(self):
+        self.buffer = ""
+        self._reply_pos: Optional[int] = None; self._reply_done = False
+        self._fields_pos: Optional[int] = None; self._fields_done = False
+        self._segment_start = 0; self._depth = 0; self._in_string = False; self._escaped = False
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        return self._advance_reply(), self._advance_fields()
+
+    def _advance_reply(self) -> str:
+        if self._reply_done: return ""
+        if self._reply_pos is None:
+            match = self._REPLY_KEY.search(self.buffer)
+            if not match: return ""
+            self._reply_pos = match.end()
+        buf, i, safe_end = self.buffer, self._reply_pos, self._reply_pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == "\\":
+                width = 6 if buf[i + 1:i + 2] == "u" else 2
+                if i + width > len(buf): break  # escape sequence split across chunks
+                i += width; safe_end = i
+            elif ch == '"':
+                self._reply_done = True
+                break
+            else:
+                i += 1; safe_end = i
+        segment = buf[self._reply_pos:safe_end]
+        self._reply_pos = safe_end
+        return json.loads(f'"{segment}"', strict=False) if segment else ""
+
+    def _advance_fields(self) -> Dict[str, Any]:
+        completed: Dict[str, Any] = {}
+        if self._fields_done: return completed
+        if self._fields_pos is None:
+            match = self._FIELDS_KEY.search(self.buffer)
+            if not match: return completed
+            self._fields_pos = self._segment_start = match.end()
+        buf = self.buffer
+        for i in range(self._fields_pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escaped: self._escaped = False
+                elif ch == "\\": self._escaped = True
+                elif ch == '"': self._in_string = False
+            elif ch == '"': self._in_string = True
+            elif ch in "[{": self._depth += 1
+            elif ch in "]}" and self._depth > 0: self._depth -= 1
+            elif self._depth == 0 and ch in ",}":
+                segment = buf[self._segment_start:i].strip()
+                if segment:
+                    try: completed.update(json.loads("{" + segment + "}"))
+                    except json.JSONDecodeError: pass
+                self._segment_start = i + 1
+                if ch == "}": self._fields_done = True; self._fields_pos = i + 1; return completed
+        self._fields_pos = len(buf)
+        return completed
 
 # --- LangGraph Nodes ---
-def call_llm_node(state: InteractionAgentState) -> Dict[str, Any]:
-    print("--- Agent Node: call_llm_node ---")
+async def request_llm_completion(messages_for_groq_api: List[Dict[str, str]], on_llm_token=None) -> str:
+    """One Groq round trip under the concurrency limiter; streams deltas to on_llm_token when given."""
+    with timed(llm_request_seconds, "stream" if on_llm_token else "complete"):
+        async with llm_semaphore:
+            if not on_llm_token:
+                chat_completion = await groq_client.chat.completions.create(messages=messages_for_groq_api, model=LLM_MODEL, temperature=0.5, max_tokens=1024,)
+                record_llm_usage(chat_completion.usage)
+                return chat_completion.choices[0].message.content
+            stream = await groq_client.chat.completions.create(messages=messages_for_groq_api, model=LLM_MODEL, temperature=0.5, max_tokens=1024, stream=True)
+            raw_parts, usage = [], None
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    raw_parts.append(delta)
+                    await on_llm_token(delta)
+                # Groq reports usage on the final chunk under x_groq; OpenAI-style servers use chunk.usage.
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            record_llm_usage(usage)
+            return "".join(raw_parts)
+
+def record_llm_usage(usage):
+    if usage is None: return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, kind, None)
+        if count is not None: llm_tokens.observe(count, kind.removesuffix("_tokens"))
+
+async def fast_path_node(state: InteractionAgentState) -> Dict[str, Any]:
+    fast_path_stats["turns"] += 1
+    messages = state.get("messages", [])
+    parsed = None
+    if FAST_PATH_ENABLED and messages and isinstance(messages[-1], HumanMessage):
+        parsed = classify_fast_path(messages[-1].content)
+    if not parsed:
+        fast_path_stats["fallbacks"] += 1
+        return {"current_action_type": None}
+    action_type = parsed["action_details"]["type"]
+    fast_path_stats["served"] += 1
+    fast_path_stats["by_action"][action_type] = fast_path_stats["by_action"].get(action_type, 0) + 1
+    return {"last_llm_parsed_json": parsed, "current_action_type": action_type}
+
+def route_fast_path(state: InteractionAgentState) -> str:
+    route = route_for_action(state["current_action_type"]) if state.get("current_action_type") else "call_llm"
+    agent_routes_total.inc("fast_path", route)
+    return route
+
+async def call_llm_node(state: InteractionAgentState, config: RunnableConfig = None) -> Dict[str, Any]:
     if not groq_client: return {"last_llm_parsed_json": {"conversational_reply": "AI service unavailable.", "action_details": {"type": "ERROR", "detail": "GroqClientNotInit"}}, "current_action_type": "ERROR"}
     current_messages_from_state = state.get("messages", [])
     last_user_message_content = current_messages_from_state[-1].content if current_messages_from_state and isinstance(current_messages_from_state[-1], HumanMessage) else ""
     if not last_user_message_content: return {"last_llm_parsed_json": {"conversational_reply": "No user message to process.", "action_details": {"type": "ERROR", "detail": "NoUserMessageInState"}}, "current_action_type": "ERROR"}
-    messages_for_groq_api = [{"role": "system", "content": LLM_SYSTEM_PROMPT},{"role": "user", "content": last_user_message_content}]
+    messages_for_groq_api = [{"role": "system", "content": LLM_SYSTEM_PROMPT}]
+    # Carry prior turns as a compact context block instead of replaying the whole interaction.
+    context_parts = []
+    if state.get("conversation_summary"): context_parts.append(f"Earlier in this conversation:\n{state['conversation_summary']}")
+    if state.get("current_extracted_fields"): context_parts.append(f"Fields extracted so far: {json.dumps(state['current_extracted_fields'], default=str)}")
+    if context_parts: messages_for_groq_api.append({"role": "system", "content": "\n".join(context_parts)})
+    history = messages_to_session(current_messages_from_state)
+    messages_for_groq_api.extend({"role": m["role"], "content": m["content"]} for m in history)
+    # Streaming callers pass an async token callback through the graph config.
+    on_llm_token = ((config or {}).get("configurable") or {}).get("on_llm_token")
+    # Turns with a summary, extracted fields or earlier messages can resolve "she" / "its side effects" from
+    # that context, so their replies are neither looked up nor stored.
+    cache_key = llm_cache_key(last_user_message_content) if not context_parts and len(history) == 1 else None
     try:
-        chat_completion = groq_client.chat.completions.create(messages=messages_for_groq_api, model="gemma2-9b-it", temperature=0.5, max_tokens=1024,)
-        groq_raw_response = chat_completion.choices[0].message.content
+        groq_raw_response = llm_response_cache.get(cache_key) if cache_key else None
+        from_cache = groq_raw_response is not None
+        if from_cache:
+            if on_llm_token: await on_llm_token(groq_raw_response)
+        else:
+            groq_raw_response = await request_llm_completion(messages_for_groq_api, on_llm_token)
         cleaned_response_str = groq_raw_response
         if groq_raw_response: 
             match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", groq_raw_response)
@@ -174,39 +1761,41 @@ def call_llm_node(state: InteractionAgentState) -> Dict[str, Any]:
         try:
             parsed_llm_output = json.loads(cleaned_response_str)
             action_type_from_llm = parsed_llm_output.get("action_details", {}).get("type", "UNKNOWN_ACTION")
+            if cache_key and not from_cache and llm_reply_cacheable(parsed_llm_output, last_user_message_content):
+                llm_response_cache.put(cache_key, groq_raw_response, LLM_CACHE_TTL_SECONDS)
+            llm_responses_total.inc("cached" if from_cache else "ok")
             return {"last_llm_parsed_json": parsed_llm_output, "current_action_type": action_type_from_llm}
         except json.JSONDecodeError:
-            print(f"ERROR: LLM JSONDecodeError: {cleaned_response_str}")
+            llm_responses_total.inc("bad_json")
+            logger.warning("LLM returned invalid JSON (%d chars)", len(cleaned_response_str or ""))
+            logger.debug("Invalid LLM JSON: %s", cleaned_response_str)
             return {"last_llm_parsed_json": {"conversational_reply": cleaned_response_str, "action_details": {"type": "ERROR", "detail": "LLMBadJSON"}}, "current_action_type": "ERROR"}
     except Exception as e:
-        print(f"ERROR during LLM call: {e}")
+        llm_responses_total.inc("error")
+        logger.error("Error during LLM call: %s", e)
         return {"last_llm_parsed_json": {"conversational_reply": f"Error communicating with AI: {str(e)}", "action_details": {"type": "ERROR", "detail": str(e)}}, "current_action_type": "ERROR"}
 
 # --- Tool Execution Nodes ---
-def execute_retrieve_hcp_profile_node(state: InteractionAgentState) -> Dict[str, str]:
-    print("--- Agent Node: execute_retrieve_hcp_profile_node ---")
+async def execute_retrieve_hcp_profile_node(state: InteractionAgentState) -> Dict[str, str]:
     action_details = state.get("last_llm_parsed_json", {}).get("action_details", {})
     hcp_name = action_details.get("hcp_name")
-    tool_result = run_retrieve_hcp_profile_tool(hcp_name)
+    tool_result = await cached_tool_call("retrieve_hcp_profile", run_retrieve_hcp_profile_tool, hcp_name)
     return {"tool_output": tool_result, "current_action_type": "RETRIEVE_HCP_PROFILE_EXECUTED"}
 
-def execute_suggest_next_action_node(state: InteractionAgentState) -> Dict[str, str]:
-    print("--- Agent Node: execute_suggest_next_action_node ---")
+async def execute_suggest_next_action_node(state: InteractionAgentState) -> Dict[str, str]:
     action_details = state.get("last_llm_parsed_json", {}).get("action_details", {})
     hcp_name = action_details.get("hcp_name") # Optional for this tool
-    tool_result = run_suggest_next_action_tool(hcp_name)
+    tool_result = await cached_tool_call("suggest_next_action", run_suggest_next_action_tool, hcp_name)
     return {"tool_output": tool_result, "current_action_type": "SUGGEST_NEXT_ACTION_EXECUTED"}
 
-def execute_query_product_info_node(state: InteractionAgentState) -> Dict[str, str]:
-    print("--- Agent Node: execute_query_product_info_node ---")
+async def execute_query_product_info_node(state: InteractionAgentState) -> Dict[str, str]:
     action_details = state.get("last_llm_parsed_json", {}).get("action_details", {})
     product_name = action_details.get("product_name")
     query_details = action_details.get("query_details")
-    tool_result = run_query_product_info_tool(product_name, query_details)
+    tool_result = await cached_tool_call("query_product_info", run_query_product_info_tool, product_name, query_details)
     return {"tool_output": tool_result, "current_action_type": "QUERY_PRODUCT_INFO_EXECUTED"}
 
-def process_direct_updates_node(state: InteractionAgentState) -> Dict[str, Any]:
-    print("--- Agent Node: process_direct_updates_node ---")
+async def process_direct_updates_node(state: InteractionAgentState) -> Dict[str, Any]:
     action_details = state.get("last_llm_parsed_json", {}).get("action_details", {})
     action_type = action_details.get("type") 
     current_fields = dict(state.get("current_extracted_fields", {}))
@@ -218,8 +1807,7 @@ def process_direct_updates_node(state: InteractionAgentState) -> Dict[str, Any]:
         if field_to_edit and new_value is not None: current_fields[field_to_edit] = new_value
     return {"current_extracted_fields": current_fields, "current_action_type": action_type}
 
-def prepare_final_response_node(state: InteractionAgentState) -> InteractionAgentState:
-    print("--- Agent Node: prepare_final_response_node ---")
+async def prepare_final_response_node(state: InteractionAgentState) -> InteractionAgentState:
     llm_output = state.get("last_llm_parsed_json", {})
     tool_result = state.get("tool_output")
     final_reply_content = tool_result if tool_result else llm_output.get("conversational_reply", "I'm not sure how to respond.")
@@ -234,24 +1822,47 @@ def prepare_final_response_node(state: InteractionAgentState) -> InteractionAgen
     }
 
 def route_action_node(state: InteractionAgentState) -> str:
-    print("--- Agent Node: route_action_node ---")
     action_type = state.get("current_action_type", "UNKNOWN_ACTION") # This was set by call_llm_node
-    print(f"Routing based on action_type from state: {action_type}")
+    route = route_for_action(action_type)
+    agent_routes_total.inc("call_llm", route)
+    logger.debug("Routing action_type %s to %s", action_type, route)
+    return route
+
+def route_for_action(action_type: Optional[str]) -> str:
     if action_type == "RETRIEVE_HCP_PROFILE": return "execute_retrieve_hcp_profile_node"
     elif action_type == "SUGGEST_NEXT_ACTION": return "execute_suggest_next_action_node"
     elif action_type == "QUERY_PRODUCT_INFO": return "execute_query_product_info_node"
     elif action_type in ["EXTRACT_INFO", "EDIT_FIELD"]: return "process_direct_updates_node"
     else: return "prepare_final_response_node" # Default/fallback
 
+def instrumented_node(name: str, node_fn):
+    """Wraps a node so its wall time lands in hcp_agent_node_seconds (and the current trace, if sampled)."""
+    wants_config = "config" in inspect.signature(node_fn).parameters
+    async def run(state: InteractionAgentState, config: RunnableConfig = None):
+        with timed(agent_node_seconds, name):
+            return await (node_fn(state, config) if wants_config else node_fn(state))
+    run.__name__ = node_fn.__name__
+    return run
+
 # Graph Definition
 workflow = StateGraph(InteractionAgentState)
-workflow.add_node("call_llm", call_llm_node)
-workflow.add_node("execute_retrieve_hcp_profile_node", execute_retrieve_hcp_profile_node)
-workflow.add_node("execute_suggest_next_action_node", execute_suggest_next_action_node) # New node
-workflow.add_node("execute_query_product_info_node", execute_query_product_info_node)   # New node
-workflow.add_node("process_direct_updates_node", process_direct_updates_node)
-workflow.add_node("prepare_final_response_node", prepare_final_response_node)
-workflow.set_entry_point("call_llm")
+workflow.add_node("fast_path", instrumented_node("fast_path", fast_path_node))
+workflow.add_node("call_llm", instrumented_node("call_llm", call_llm_node))
+workflow.add_node("execute_retrieve_hcp_profile_node", instrumented_node("execute_retrieve_hcp_profile_node", execute_retrieve_hcp_profile_node))
+workflow.add_node("execute_suggest_next_action_node", instrumented_node("execute_suggest_next_action_node", execute_suggest_next_action_node)) # New node
+workflow.add_node("execute_query_product_info_node", instrumented_node("execute_query_product_info_node", execute_query_product_info_node))   # New node
+workflow.add_node("process_direct_updates_node", instrumented_node("process_direct_updates_node", process_direct_updates_node))
+workflow.add_node("prepare_final_response_node", instrumented_node("prepare_final_response_node", prepare_final_response_node))
+workflow.set_entry_point("fast_path")
+workflow.add_conditional_edges(
+    "fast_path", route_fast_path,
+    {
+        "call_llm": "call_llm",
+        "execute_retrieve_hcp_profile_node": "execute_retrieve_hcp_profile_node",
+        "execute_query_product_info_node": "execute_query_product_info_node",
+        "process_direct_updates_node": "process_direct_updates_node",
+    }
+)
 workflow.add_conditional_edges(
     "call_llm", route_action_node,
     {
@@ -269,98 +1880,275 @@ workflow.add_edge("process_direct_updates_node", "prepare_final_response_node")
 workflow.add_edge("prepare_final_response_node", END)
 hcp_interaction_agent = workflow.compile()
 
-# --- FastAPI App (Keep as is) ---
-app = FastAPI(title="AI-First HCP CRM Backend", version="0.1.0")
+# --- FastAPI App ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pay the connect cost once per worker, off the event loop.
+    await run_in_threadpool(init_db_pool)
+    await run_in_threadpool(load_fast_path_gazetteers)
+    await run_in_threadpool(refresh_name_indexes, True)
+    index_refresher = asyncio.create_task(name_index_refresh_loop())
+    global write_behind
+    if WRITE_BEHIND_ENABLED:
+        spool = WriteBehindSpool(WRITE_BEHIND_SPOOL_DIR)
+        if await spool.start(): write_behind = spool
+        else: logger.warning("Write-behind spool %s is owned by another worker; this worker saves synchronously.", WRITE_BEHIND_SPOOL_DIR)
+    yield
+    index_refresher.cancel()
+    if write_behind: await write_behind.stop(); write_behind = None
+    await run_in_threadpool(close_db_pool)
+
+app = FastAPI(title="AI-First HCP CRM Backend", version="0.1.0", lifespan=lifespan)
 origins = [ "http://localhost:5173", "http://localhost:3000" ]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 @app.get("/")
 async def read_root(): return {"message": "Welcome!"}
 
-@app.post("/interactions/log_structured", response_model=InteractionLogResponse)
+@app.get("/health/db")
+async def db_health():
+    idle = db_pool._cnx_queue.qsize() if db_pool is not None else 0
+    return {
+        "pool_ready": db_pool is not None, "pool_size": DB_POOL_SIZE, "idle_connections": idle,
+        "acquire_timeout_s": DB_POOL_ACQUIRE_TIMEOUT, **db_pool_metrics,
+    }
+
+@app.get("/fast_path/stats")
+async def fast_path_statistics():
+    served_rate = fast_path_stats["served"] / fast_path_stats["turns"] if fast_path_stats["turns"] else 0.0
+    return {**fast_path_stats, "served_rate": round(served_rate, 4), "enabled": FAST_PATH_ENABLED,
+            "known_hcps": len(hcp_gazetteer.canonical), "known_products": len(product_gazetteer.canonical)}
+
+@app.post("/fast_path/gazetteers/refresh")
+async def refresh_fast_path_gazetteers():
+    await run_in_threadpool(load_fast_path_gazetteers)
+    invalidate_tool_cache()
+    return {"known_hcps": len(hcp_gazetteer.canonical), "known_products": len(product_gazetteer.canonical)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+async def debug_traces(limit: int = Query(20, ge=1, le=1000)):
+    return {"sample_rate": TRACE_SAMPLE_RATE, "traces": list(recent_traces)[-limit:]}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"llm": llm_response_cache.stats(), "tool": tool_result_cache.stats(), "prompt_hash": LLM_SYSTEM_PROMPT_HASH}
+
+@app.post("/cache/invalidate")
+async def cache_invalidate(tool_name: Optional[str] = None, include_llm: bool = False):
+    removed = {"tool": invalidate_tool_cache(tool_name)}
+    if include_llm: removed["llm"] = llm_response_cache.invalidate()
+    return {"removed": removed}
+
+@app.post("/name_index/refresh")
+async def refresh_name_index_endpoint(full: bool = False):
+    changed = await run_in_threadpool(refresh_name_indexes, full)
+    return {"changed": changed, "hcps_indexed": len(hcp_name_index), "products_indexed": len(product_name_index)}
+
+@app.get("/sessions/stats")
+async def session_stats(): return await session_store.stats()
+
+@app.get("/sessions/{session_id}/stats")
+async def session_detail_stats(session_id: str):
+    return {"session_id": session_id, "bytes": await session_store.session_bytes(session_id)}
+
+@app.post("/interactions/log_structured", response_model=Union[InteractionLogResponse, InteractionLogAccepted])
 async def log_or_update_structured_interaction(interaction_data: InteractionLogCreate):
-    # (Your existing log_structured endpoint - keep as is)
-    # ... (ensure this part is complete from previous steps) ...
-    print("Received structured interaction data:")
-    print(f"Data ID: {interaction_data.id}, HCP: {interaction_data.hcpName}") 
+    logger.debug("Received structured interaction data: id=%s, hcp=%r", interaction_data.id, interaction_data.hcpName)
+    if write_behind:
+        # Key the log up front: if the spool write fails after the record reached the disk, the synchronous save
+        # below and a later replay then resolve to the same row.
+        if not interaction_data.idempotencyKey: interaction_data = interaction_data.model_copy(update={"idempotencyKey": uuid.uuid4().hex})
+        try:
+            accepted_id = await write_behind.append(interaction_data)
+            accepted = InteractionLogAccepted(accepted_id=accepted_id, queue_depth=write_behind.queue_depth(),
+                                              message="Interaction log accepted and queued for saving.")
+            return JSONResponse(status_code=202, content=accepted.model_dump())
+        except OSError as e: logger.error("Write-behind append failed (%s); saving synchronously.", e)
+    # Pool acquisition and queries are blocking; keep them off the event loop.
+    return await run_in_threadpool(save_interaction_log, interaction_data)
+
+@app.get("/interactions/accepted/{accepted_id}")
+async def accepted_interaction_status(accepted_id: str):
+    """Where a log accepted by the write-behind spool is: queued, stored (with its id) or dead_lettered."""
+    status = write_behind.status_of(accepted_id) if write_behind else None
+    key = write_behind.superseded.get(accepted_id, accepted_id) if write_behind else accepted_id  # a coalesced update resolves to its successor
+    if status == "dead_lettered": return {"accepted_id": accepted_id, "status": status, "error": write_behind.dead_letters[key]}
+    if status: return {"accepted_id": accepted_id, "status": status}
+    row = await run_in_threadpool(fetch_one, "SELECT id, version FROM interaction_logs WHERE idempotencyKey = %s", (key,))
+    if not row:
+        row = await run_in_threadpool(fetch_one, "SELECT interaction_log_id AS id, version FROM interaction_log_updates WHERE idempotencyKey = %s", (key,))
+    if not row: raise HTTPException(status_code=404, detail=f"No queued or stored log for accepted id {accepted_id}.")
+    return {"accepted_id": accepted_id, "status": "stored", "id": row["id"], "version": row["version"]}
+
+@app.get("/write_behind/stats")
+async def write_behind_stats():
+    return {"enabled": write_behind is not None, **(write_behind.snapshot() if write_behind else {})}
+
+@db_timed("save_interaction_log")
+def save_interaction_log(interaction_data: InteractionLogCreate) -> InteractionLogResponse:
     conn = get_db_connection()
     if not conn: raise HTTPException(status_code=503, detail="Database connection failed.")
-    cursor = None; interaction_id_to_return = interaction_data.id 
+    cursor, stats = None, Counter()
     try:
         cursor = conn.cursor()
-        if interaction_data.id is not None:
-            cursor.execute("SELECT id FROM interaction_logs WHERE id = %s", (interaction_data.id,))
-            if cursor.fetchone() is None: conn.rollback(); raise HTTPException(status_code=404, detail=f"Log ID {interaction_data.id} not found for update.")
-            sql_update_interaction_log = """UPDATE interaction_logs SET
-                    hcpName = %s, interactionType = %s, interactionDate = %s, interactionTime = %s, attendees = %s, 
-                    topicsDiscussed = %s, sentiment = %s, outcomes = %s, followUpActions = %s, chatSessionId = %s
-                    WHERE id = %s"""
-            log_values = (interaction_data.hcpName, interaction_data.interactionType, interaction_data.date, interaction_data.time,
-                interaction_data.attendees, interaction_data.topicsDiscussed, interaction_data.sentiment, interaction_data.outcomes,
-                interaction_data.followUpActions, interaction_data.chatSessionId, interaction_data.id)
-            cursor.execute(sql_update_interaction_log, log_values)
-            for table_name in ["interaction_materials_shared", "interaction_samples_distributed", "interaction_products_discussed_ai"]:
-                cursor.execute(f"DELETE FROM {table_name} WHERE interaction_log_id = %s", (interaction_data.id,))
-        else:
-            sql_insert_interaction_log = """INSERT INTO interaction_logs (hcpName, interactionType, interactionDate, interactionTime, attendees,
-                topicsDiscussed, sentiment, outcomes, followUpActions, chatSessionId) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-            log_values = (interaction_data.hcpName, interaction_data.interactionType, interaction_data.date, interaction_data.time,
-                interaction_data.attendees, interaction_data.topicsDiscussed, interaction_data.sentiment, interaction_data.outcomes,
-                interaction_data.followUpActions, interaction_data.chatSessionId)
-            cursor.execute(sql_insert_interaction_log, log_values)
-            interaction_id_to_return = cursor.lastrowid
-
-        if interaction_data.materialsShared and interaction_id_to_return:
-            sql_materials = "INSERT INTO interaction_materials_shared (interaction_log_id, material_name) VALUES (%s, %s)"
-            cursor.executemany(sql_materials, [(interaction_id_to_return, m.name) for m in interaction_data.materialsShared])
-        if interaction_data.samplesDistributed and interaction_id_to_return:
-            sql_samples = "INSERT INTO interaction_samples_distributed (interaction_log_id, sample_name) VALUES (%s, %s)"
-            cursor.executemany(sql_samples, [(interaction_id_to_return, s.name) for s in interaction_data.samplesDistributed])
-        if interaction_data.productsDiscussed and interaction_id_to_return:
-            sql_products_ai = "INSERT INTO interaction_products_discussed_ai (interaction_log_id, product_name) VALUES (%s, %s)"
-            cursor.executemany(sql_products_ai, [(interaction_id_to_return, p) for p in interaction_data.productsDiscussed])
+        result = write_interaction_log(cursor, interaction_data, stats)
         conn.commit() 
+        record_write_stats(stats)
+        interaction_id_to_return, status = result["id"], result["status"]
         response_data = interaction_data.model_dump(); response_data["id"] = interaction_id_to_return
-        response_data["message"] = f"Interaction log (ID: {interaction_id_to_return}) {'updated' if interaction_data.id else 'saved'} successfully."
+        response_data["version"] = result["version"]; response_data["rowsWritten"] = result["rows_written"]
+        if status == "unchanged": response_data["message"] = f"Interaction log (ID: {interaction_id_to_return}) unchanged; nothing written."
+        else: response_data["message"] = f"Interaction log (ID: {interaction_id_to_return}) {'already saved' if status == 'duplicate' else status} successfully."
         return InteractionLogResponse(**response_data)
-    except MySQLError as e: print(f"DB error: {e}"); conn.rollback(); raise HTTPException(status_code=500, detail=f"Database error: {e.msg}")
-    except HTTPException as he: conn.rollback(); raise he
-    except Exception as e: print(f"Unexpected error: {e}"); conn.rollback(); raise HTTPException(status_code=500, detail=f"Unexpected server error: {str(e)}")
+    except MySQLError as e: logger.error("DB error: %s", e); conn.rollback(); raise HTTPException(status_code=500, detail=f"Database error: {e.msg}")
+    except HTTPException as he: conn.rollback(); record_write_stats(stats); raise he
+    except Exception as e: logger.exception("Unexpected error saving interaction log: %s", e); conn.rollback(); raise HTTPException(status_code=500, detail=f"Unexpected server error: {str(e)}")
     finally:
         if cursor: cursor.close()
         if conn and conn.is_connected(): conn.close()
 
-@app.post("/interactions/log_chat_message", response_model=AIChatResponse)
-async def langgraph_chat_endpoint(chat_message: AIChatMessage):
-    print("\n--- LangGraph Endpoint: Received AI chat message from frontend ---")
-    print(chat_message.model_dump_json(indent=2))
-    
+@app.get("/interactions", response_model=InteractionLogPage)
+async def list_interaction_logs(hcp: Optional[str] = None, date_from: Optional[d] = None, date_to: Optional[d] = None,
+                                sentiment: Optional[str] = None, product: Optional[str] = None, interaction_type: Optional[str] = None,
+                                q: Optional[str] = None, limit: int = Query(QUERY_PAGE_DEFAULT, ge=1, le=QUERY_PAGE_MAX),
+                                cursor: Optional[str] = None):
+    return await run_in_threadpool(query_interaction_logs, hcp, date_from, date_to, sentiment, product, interaction_type, q, limit, cursor)
+
+@app.get("/analytics/engagement")
+async def engagement_stats(dimension: str = "all", value: Optional[str] = None, week_from: Optional[d] = None,
+                           week_to: Optional[d] = None, limit: int = Query(20, ge=1, le=500)):
+    return await run_in_threadpool(query_engagement, dimension, value, week_from, week_to, limit)
+
+@app.post("/analytics/rollups/rebuild")
+async def rebuild_rollups_endpoint(dry_run: bool = False):
+    return await run_in_threadpool(rebuild_rollups, not dry_run)
+
+@app.get("/interactions/write_stats")
+async def interaction_write_stats():
+    avg = write_stats["rows_written"] / write_stats["writes"] if write_stats["writes"] else 0.0
+    return {**write_stats, "avg_rows_per_write": round(avg, 2)}
+
+@app.post("/interactions/log_structured/batch", response_model=BatchIngestResponse)
+async def log_structured_batch(request: Request):
+    """Bulk ingestion: a JSON array or an NDJSON stream (Content-Type: application/x-ndjson) of
+    InteractionLogCreate objects, written in BATCH_CHUNK_SIZE transactions. Send an idempotencyKey
+    per log so a retried upload reports "duplicate" instead of inserting twice. A JSON array longer than
+    BATCH_MAX_ITEMS is rejected with 413 before anything is written; an NDJSON stream is read up to the
+    limit, and the first item past it comes back failed with truncated=true."""
+    started = time.perf_counter()
+    results: List[BatchItemResult] = []
+    pending: List[tuple] = []
+    received, truncated = 0, False
+    async for index, item in iter_batch_items(request):
+        received += 1
+        if received > BATCH_MAX_ITEMS:
+            # Earlier chunks are already committed, so stop reading and report them instead of failing the request.
+            results.append(BatchItemResult(index=index, status="failed", error=f"Batch exceeds {BATCH_MAX_ITEMS} items; this and later items were not read."))
+            truncated = True; break
+        if isinstance(item, str):
+            results.append(BatchItemResult(index=index, status="failed", error=item)); continue
+        pending.append((index, item))
+        if len(pending) >= BATCH_CHUNK_SIZE:
+            results.extend(await run_in_threadpool(write_interaction_batch, pending)); pending = []
+    if pending: results.extend(await run_in_threadpool(write_interaction_batch, pending))
+    results.sort(key=lambda r: r.index)
+    counts = Counter(r.status for r in results)
+    logger.info("Batch ingest: %d received, %s", received, dict(counts))
+    return BatchIngestResponse(received=received, created=counts["created"], updated=counts["updated"], unchanged=counts["unchanged"],
+                               duplicates=counts["duplicate"], failed=counts["failed"], rows_written=sum(r.rowsWritten for r in results), truncated=truncated, elapsed_ms=round((time.perf_counter() - started) * 1000, 1), results=results)
+
+async def start_agent_turn(chat_message: AIChatMessage):
+    session_id = chat_message.session_id or f"session_lg_{os.urandom(8).hex()}"
+    session = await session_store.get(session_id) or {}
     initial_agent_input_state: InteractionAgentState = {
-        "messages": [HumanMessage(content=chat_message.user_message)],
-        "current_extracted_fields": {}, 
+        "messages": messages_from_session(session.get("messages", [])) + [HumanMessage(content=chat_message.user_message)],
+        "current_extracted_fields": session.get("current_extracted_fields", {}), 
         "last_llm_parsed_json": None,
         "tool_output": None,
-        "current_action_type": None 
+        "current_action_type": None,
+        "conversation_summary": session.get("summary", ""),
     }
+    return session_id, session, initial_agent_input_state
 
+async def finish_agent_turn(session_id: str, session: Dict[str, Any], final_state: InteractionAgentState) -> AIChatResponse:
+    ai_conversational_reply = "Could not determine AI reply."
+    if final_state.get("messages") and final_state["messages"] and isinstance(final_state["messages"][-1], AIMessage):
+        ai_conversational_reply = final_state["messages"][-1].content
+    
+    current_extracted_data = final_state.get("current_extracted_fields")
+    final_action_type_from_agent = final_state.get("current_action_type", "UNKNOWN")
+
+    kept_messages, summary = compact_session_history(messages_to_session(final_state.get("messages", [])), session.get("summary", ""))
+    await session_store.put(session_id, {"messages": kept_messages, "current_extracted_fields": current_extracted_data or {}, "summary": summary})
+
+    return AIChatResponse(
+        ai_response=ai_conversational_reply,
+        extracted_data=current_extracted_data,
+        is_complete=False, 
+        final_action_type=final_action_type_from_agent,
+        session_id=session_id
+    )
+
+@app.post("/interactions/log_chat_message", response_model=AIChatResponse)
+async def langgraph_chat_endpoint(chat_message: AIChatMessage):
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("Chat message received: %s", chat_message.model_dump_json())
+    trace_token = start_trace("log_chat_message")
     try:
-        final_state = hcp_interaction_agent.invoke(initial_agent_input_state)
-        print(f"--- LangGraph Endpoint: Agent final state --- \n{final_state}")
-        
-        ai_conversational_reply = "Could not determine AI reply."
-        if final_state.get("messages") and final_state["messages"] and isinstance(final_state["messages"][-1], AIMessage):
-            ai_conversational_reply = final_state["messages"][-1].content
-        
-        current_extracted_data = final_state.get("current_extracted_fields")
-        final_action_type_from_agent = final_state.get("current_action_type", "UNKNOWN")
-
-        return AIChatResponse(
-            ai_response=ai_conversational_reply,
-            extracted_data=current_extracted_data,
-            is_complete=False, 
-            final_action_type=final_action_type_from_agent,
-            session_id=chat_message.session_id or f"session_lg_{os.urandom(8).hex()}"
-        )
+        with timed(agent_turn_seconds, "log_chat_message"):
+            session_id, session, initial_agent_input_state = await start_agent_turn(chat_message)
+            final_state = await hcp_interaction_agent.ainvoke(initial_agent_input_state)
+            logger.debug("Agent turn finished with action %s", final_state.get("current_action_type"))
+            return await finish_agent_turn(session_id, session, final_state)
+    except HTTPException: raise
     except Exception as e:
-        print(f"ERROR: Exception during LangGraph agent invocation: {e}")
+        logger.exception("Exception during LangGraph agent invocation: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing message with AI agent: {str(e)}")
+    finally:
+        finish_trace(trace_token)
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/interactions/log_chat_message/stream")
+async def langgraph_chat_stream_endpoint(chat_message: AIChatMessage):
+    """Server-Sent Events variant of /interactions/log_chat_message.
+    Emits 'token' events with conversational_reply text as the LLM produces it, a 'field' event
+    for each extracted field as soon as its value is complete, then a final 'done' event carrying
+    the same payload as the non-streaming endpoint (or an 'error' event)."""
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("Streamed chat message received: %s", chat_message.model_dump_json())
+    session_id, session, initial_agent_input_state = await start_agent_turn(chat_message)
+    events: asyncio.Queue = asyncio.Queue()
+    json_parser = IncrementalLLMJSONParser()
+
+    async def on_llm_token(delta: str):
+        reply_delta, completed_fields = json_parser.feed(delta)
+        if reply_delta: await events.put(sse_event("token", {"text": reply_delta}))
+        for field, value in completed_fields.items(): await events.put(sse_event("field", {"field": field, "value": value}))
+
+    async def run_agent():
+        trace_token = start_trace("log_chat_message_stream")
+        try:
+            with timed(agent_turn_seconds, "log_chat_message_stream"):
+                final_state = await hcp_interaction_agent.ainvoke(initial_agent_input_state, config={"configurable": {"on_llm_token": on_llm_token}})
+                response = await finish_agent_turn(session_id, session, final_state)
+            await events.put(sse_event("done", response.model_dump()))
+        except Exception as e:
+            logger.exception("Exception during streamed LangGraph agent invocation: %s", e)
+            await events.put(sse_event("error", {"detail": f"Error processing message with AI agent: {str(e)}"}))
+        finally:
+            finish_trace(trace_token)
+            await events.put(None)
+
+    async def event_stream():
+        agent_task = asyncio.create_task(run_agent())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            if not agent_task.done(): agent_task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,22 @@
+# rebuild_rollups.py
+# Recomputes the interaction_rollups table from interaction_logs and reports how many rollup rows had drifted
+# from the incrementally maintained counts. Run from the backend directory:
+#   python rebuild_rollups.py            (rebuild)
+#   python rebuild_rollups.py --dry-run  (only report drift)
+# The running app exposes the same operation as POST /analytics/rollups/rebuild?dry_run=true|false.
+import argparse
+
+import main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the engagement rollups from interaction_logs.")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without changing the table")
+    args = parser.parse_args()
+    if main.init_db_pool() is None: raise SystemExit("Database not reachable; check the .env settings.")
+    try:
+        result = main.rebuild_rollups(apply=not args.dry_run)
+        print(f"{result['logs_scanned']} logs scanned, {result['rollup_rows']} rollup rows, {result['drifted_rows']} drifted"
+              + (", table rebuilt." if result["rebuilt"] else "."))
+        if args.dry_run and result["drifted_rows"]: raise SystemExit(1)
+    finally:
+        main.close_db_pool()
@@ -0,0 +1,20 @@
+# conftest.py
+# Makes the backend importable as `main` and keeps its import quiet. Run from the backend directory:  python -m pytest tests
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+@pytest.fixture
+def db(monkeypatch):
+    """A disposable SQLite database loaded from database/hcp.sql, installed as main's connection source."""
+    import main
+    from benchmarks.db_fixture import SQLiteFixture
+    with SQLiteFixture() as fixture:
+        monkeypatch.setattr(main, "get_db_connection", fixture.connect)
+        yield fixture
@@ -0,0 +1,35 @@
+# test_fast_path.py
+# classify_fast_path(): single, valid edits are served locally; compound or invalid ones fall through to the LLM.
+import pytest
+
+import main
+
+def edit(message: str):
+    parsed = main.classify_fast_path(message)
+    return parsed and (parsed["action_details"]["field_to_edit"], parsed["action_details"]["new_value"])
+
+@pytest.mark.parametrize("message, expected", [
+    ("change sentiment to negative", ("sentiment", "Negative")),
+    ("set follow up to call in 2 weeks", ("followUpActions", "call in 2 weeks")),
+    ("set outcomes to agreed to review the data and send samples", ("outcomes", "agreed to review the data and send samples")),
+    ("update the date to 2024-02-29", ("date", "2024-02-29")),
+    ("set time to 09:30:15", ("time", "09:30")),
+])
+def test_single_edits_are_served_locally(message, expected):
+    assert edit(message) == expected
+
+@pytest.mark.parametrize("message", [
+    "set follow-up to call in 2 weeks and sentiment to negative",
+    "set follow-up to call in 2 weeks, then change the date to today",
+    "set topics to dosing; update time to 10:00",
+    "set sentiment=negative and date=today",
+])
+def test_compound_edits_fall_through_to_the_llm(message):
+    assert main.classify_fast_path(message) is None
+
+@pytest.mark.parametrize("message", [
+    "set date to 2024-13-45", "set date to 2024-02-30", "set time to 99:99", "set time to 24:00",
+    "change sentiment to ecstatic", "set date to next week",
+])
+def test_invalid_values_fall_through_to_the_llm(message):
+    assert main.classify_fast_path(message) is None
@@ -0,0 +1,57 @@
+# test_interaction_writes.py
+# Diff-based writes against the SQLite fixture: unchanged updates write nothing, stale versions get 409, and
+# write_stats counts a chunk that is rolled back and retried item by item only once.
+import pytest
+from fastapi import HTTPException
+from mysql.connector import errors as mysql_errors
+
+import main
+
+LOG = {"hcpName": "Dr. Test", "date": "2026-02-03", "time": "09:30", "sentiment": "Positive",
+       "productsDiscussed": ["OncoBoost"], "materialsShared": [{"id": "m1", "name": "OncoBoost brochure"}]}
+
+def save(**fields) -> main.InteractionLogResponse:
+    return main.save_interaction_log(main.InteractionLogCreate(**{**LOG, **fields}))
+
+def stored_sentiment(db, log_id: int) -> tuple:
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT sentiment, version FROM interaction_logs WHERE id = %s", (log_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+def test_unchanged_update_writes_no_rows(db):
+    created = save()
+    before = dict(main.write_stats)
+    again = save(id=created.id, version=created.version)
+    assert again.rowsWritten == 0 and again.version == created.version == 1 and "unchanged" in again.message
+    assert main.write_stats["unchanged"] == before["unchanged"] + 1 and main.write_stats["rows_written"] == before["rows_written"]
+
+def test_update_writes_only_the_changed_rows(db):
+    created = save()
+    updated = save(id=created.id, version=1, sentiment="Neutral", productsDiscussed=["OncoBoost", "PulmoClear"])
+    assert updated.rowsWritten == 2 and updated.version == 2  # the parent row and one product row
+    assert stored_sentiment(db, created.id) == ("Neutral", 2)
+
+def test_stale_version_gets_409(db):
+    created = save()
+    save(id=created.id, version=1, sentiment="Neutral")
+    conflicts = main.write_stats["version_conflicts"]
+    with pytest.raises(HTTPException) as exc:
+        save(id=created.id, version=1, sentiment="Negative")
+    assert exc.value.status_code == 409 and main.write_stats["version_conflicts"] == conflicts + 1
+    assert stored_sentiment(db, created.id) == ("Neutral", 2)
+
+def test_chunk_retried_item_by_item_is_counted_once(db, monkeypatch):
+    write_bulk = main._write_batch_bulk
+    def bulk_then_deadlock(cursor, items, stats):
+        write_bulk(cursor, items, stats)
+        raise mysql_errors.DatabaseError(msg="Deadlock found when trying to get lock", errno=1213)
+    monkeypatch.setattr(main, "_write_batch_bulk", bulk_then_deadlock)
+
+    before = dict(main.write_stats)
+    results = main.write_interaction_batch([(i, main.InteractionLogCreate(**LOG, idempotencyKey=f"chunk-{i}")) for i in range(3)])
+    assert [r.status for r in results] == ["created"] * 3
+    assert main.write_stats["writes"] == before["writes"] + 3
+    assert main.write_stats["rows_written"] == before["rows_written"] + sum(r.rowsWritten for r in results) == before["rows_written"] + 9
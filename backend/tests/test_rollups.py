@@ -0,0 +1,41 @@
+# test_rollups.py
+# The incrementally maintained interaction_rollups against rebuild_rollups(), which recomputes them from
+# interaction_logs: creates, updates and batches leave no drift, and drift that does appear is repaired.
+import main
+
+def log(**fields) -> main.InteractionLogCreate:
+    return main.InteractionLogCreate(**{"hcpName": "Dr. Evelyn Hayes", "date": "2026-02-03", "sentiment": "Positive",
+                                        "productsDiscussed": ["OncoBoost"], **fields})
+
+def test_seed_data_has_no_drift(db):
+    assert main.rebuild_rollups(apply=False) == {"logs_scanned": 3, "rollup_rows": 8, "drifted_rows": 0, "rebuilt": False}
+
+def test_creates_updates_and_batches_leave_no_drift(db):
+    first = main.save_interaction_log(log())
+    second = main.save_interaction_log(log(hcpName="Dr. Marcus Smith", productsDiscussed=["PulmoClear", "OncoBoost"]))
+    # Moves the log to another HCP, week, sentiment and product set, then saves it unchanged.
+    moved = main.save_interaction_log(log(id=first.id, version=1, hcpName="Dr. Hayes", date="2026-03-17", sentiment="Neutral", productsDiscussed=["PulmoClear"]))
+    main.save_interaction_log(log(id=first.id, version=moved.version, hcpName="Dr. Hayes", date="2026-03-17", sentiment="Neutral", productsDiscussed=["PulmoClear"]))
+    results = main.write_interaction_batch([
+        (0, log(idempotencyKey="batch-0")),
+        (1, log(idempotencyKey="batch-1", date="2026-02-10", sentiment=None, productsDiscussed=[])),
+        (2, log(idempotencyKey="batch-0")),  # repeated key: a duplicate, counted once
+        (3, log(id=second.id, version=1, sentiment="Negative")),
+    ])
+    assert [r.status for r in sorted(results, key=lambda r: r.index)] == ["created", "created", "duplicate", "updated"]
+
+    result = main.rebuild_rollups(apply=False)
+    assert result["logs_scanned"] == 7 and result["drifted_rows"] == 0 and not result["rebuilt"]
+
+def test_drift_is_reported_and_repaired(db):
+    main.save_interaction_log(log())
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE interaction_rollups SET interaction_count = interaction_count + 5 WHERE dimension = 'hcp' AND dim_value = %s", ("Dr. Evelyn Hayes",))
+    cursor.execute("DELETE FROM interaction_rollups WHERE dimension = 'product' AND dim_value = 'OncoBoost'")
+    conn.commit(); conn.close()
+
+    assert main.rebuild_rollups(apply=False)["drifted_rows"] == 4
+    assert main.rebuild_rollups(apply=False)["drifted_rows"] == 4  # a dry run leaves the table alone
+    assert main.rebuild_rollups(apply=True)["rebuilt"]
+    assert main.rebuild_rollups(apply=False)["drifted_rows"] == 0
@@ -0,0 +1,183 @@
+# test_write_behind.py
+# WriteBehindSpool against the SQLite fixture: replay and ack after a restart, torn tails, failed spool
+# writes, poison records, transient database errors, and looking up and replaying updates.
+import asyncio
+
+import pytest
+from mysql.connector import errors as mysql_errors
+
+import main
+
+@pytest.fixture(autouse=True)
+def fast_spool(monkeypatch):
+    monkeypatch.setattr(main, "WRITE_BEHIND_FSYNC_WINDOW_MS", 0)
+    monkeypatch.setattr(main, "WRITE_BEHIND_MAX_BACKOFF_SECONDS", 0.05)
+
+def stored(db, key: str) -> int:
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM interaction_logs WHERE idempotencyKey = %s", (key,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def log(key: str, **fields) -> main.InteractionLogCreate:
+    return main.InteractionLogCreate(hcpName="Dr. Test", date="2026-02-03", idempotencyKey=key, **fields)
+
+async def drained(spool: main.WriteBehindSpool, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if spool.queue_depth() == 0 and not spool.done: return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"spool did not drain: {spool.snapshot()}")
+
+def test_replay_after_restart_stores_each_log_once(db, tmp_path, monkeypatch):
+    async def accept_while_db_down():
+        monkeypatch.setattr(main, "get_db_connection", lambda: None)
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        for i in range(3): await spool.append(log(f"replay-{i}"))
+        await spool.stop()
+        monkeypatch.setattr(main, "get_db_connection", db.connect)
+
+    async def restart() -> main.WriteBehindSpool:
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await drained(spool)
+        await spool.stop()
+        return spool
+
+    asyncio.run(accept_while_db_down())
+    spool = asyncio.run(restart())
+    assert spool.stats["replayed"] == 3 and spool.stats["drained"] == 3
+    assert spool.acked_seq == 3 and (tmp_path / "spool.ack").read_text() == "3"
+    assert all(stored(db, f"replay-{i}") == 1 for i in range(3))
+
+    # A crash between the database commit and the ack replays the records again: they must come back as duplicates.
+    (tmp_path / "spool.ack").write_text("0")
+    spool = asyncio.run(restart())
+    assert spool.stats["duplicates"] == 3 and spool.stats["drained"] == 0
+    assert all(stored(db, f"replay-{i}") == 1 for i in range(3))
+
+def test_torn_tail_is_dropped_on_open(db, tmp_path):
+    async def accept_two():
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await spool.append(log("torn-0")); await spool.append(log("torn-1"))
+        await drained(spool)
+        await spool.stop()
+
+    asyncio.run(accept_two())
+    intact = (tmp_path / "spool.log").stat().st_size
+    (tmp_path / "spool.ack").write_text("1")
+    with open(tmp_path / "spool.log", "ab") as f: f.write(b'{"seq": 3, "data": {"hcpNa')
+    spool = main.WriteBehindSpool(str(tmp_path))
+    assert spool.open()
+    assert [seq for seq, _, _ in spool.pending] == [2] and spool.next_seq == 3
+    assert (tmp_path / "spool.log").stat().st_size == intact
+    spool._log_file.close(); spool._lock_file.close()
+
+def test_failed_spool_write_does_not_stall_the_ack(db, tmp_path, monkeypatch):
+    async def scenario():
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        write_and_sync = spool._write_and_sync
+        def fail_once(payload: bytes):
+            monkeypatch.setattr(spool, "_write_and_sync", write_and_sync)
+            raise OSError(28, "No space left on device")
+        monkeypatch.setattr(spool, "_write_and_sync", fail_once)
+        with pytest.raises(OSError): await spool.append(log("lost"))
+        await spool.append(log("kept"))
+        await drained(spool)
+        await spool.stop()
+        return spool
+
+    spool = asyncio.run(scenario())
+    assert spool.acked_seq == 2 and not spool.done
+    assert stored(db, "kept") == 1 and stored(db, "lost") == 0
+    assert b"lost" not in (tmp_path / "spool.log").read_bytes()
+
+def test_poison_record_is_dead_lettered_without_blocking_others(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "WRITE_BEHIND_MAX_ATTEMPTS", 2)
+    write_batch = main.write_interaction_batch
+    def buggy_write(items):
+        if any(data.idempotencyKey == "poison" for _, data in items): raise KeyError("interactionDate")
+        return write_batch(items)
+    monkeypatch.setattr(main, "write_interaction_batch", buggy_write)
+
+    async def scenario():
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await asyncio.gather(*(spool.append(log(key)) for key in ("good-0", "poison", "good-1")))
+        await drained(spool)
+        await spool.stop()
+        return spool
+
+    spool = asyncio.run(scenario())
+    assert spool.status_of("poison") == "dead_lettered" and spool.stats["dead_lettered"] == 1
+    assert stored(db, "good-0") == 1 and stored(db, "good-1") == 1
+    assert spool.acked_seq == 3
+
+def test_transient_database_errors_do_not_spend_attempts(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "WRITE_BEHIND_MAX_ATTEMPTS", 1)
+    write_batch, failures = main.write_interaction_batch, iter(range(3))
+    def flaky_write(items):
+        if next(failures, None) is not None: raise mysql_errors.OperationalError(msg="Lost connection to MySQL server during query", errno=2013)
+        return write_batch(items)
+    monkeypatch.setattr(main, "write_interaction_batch", flaky_write)
+
+    async def scenario():
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await spool.append(log("flaky"))
+        await drained(spool)
+        await spool.stop()
+        return spool
+
+    spool = asyncio.run(scenario())
+    assert spool.stats["db_unavailable"] == 3 and spool.stats["dead_lettered"] == 0
+    assert stored(db, "flaky") == 1
+
+def accepted(key: str) -> dict:
+    return asyncio.run(main.accepted_interaction_status(key))
+
+def create_and_update(db, tmp_path, *updates: dict) -> main.WriteBehindSpool:
+    """Drains log("base"), then the updates to it (appended together) keyed "update-0", "update-1", ..."""
+    async def scenario():
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await spool.append(log("base"))
+        await drained(spool)
+        conn = db.connect(); cursor = conn.cursor()
+        cursor.execute("SELECT id FROM interaction_logs WHERE idempotencyKey = %s", ("base",))
+        log_id = cursor.fetchone()[0]; conn.close()
+        await asyncio.gather(*(spool.append(log(f"update-{i}", id=log_id, **fields)) for i, fields in enumerate(updates)))
+        await drained(spool)
+        await spool.stop()
+        return spool
+    return asyncio.run(scenario())
+
+def test_drained_update_is_found_by_its_accepted_id(db, tmp_path):
+    create_and_update(db, tmp_path, {"version": 1, "sentiment": "Negative"})
+    base, update = accepted("base"), accepted("update-0")
+    assert update == {"accepted_id": "update-0", "status": "stored", "id": base["id"], "version": 2}
+    assert base["version"] == 2
+
+def test_replayed_update_is_a_duplicate_not_a_conflict(db, tmp_path):
+    create_and_update(db, tmp_path, {"version": 1, "sentiment": "Negative"})
+    (tmp_path / "spool.ack").write_text("1")
+
+    async def restart() -> main.WriteBehindSpool:
+        spool = main.WriteBehindSpool(str(tmp_path))
+        assert await spool.start()
+        await drained(spool)
+        await spool.stop()
+        return spool
+
+    spool = asyncio.run(restart())
+    assert spool.stats["duplicates"] == 1 and spool.stats["dead_lettered"] == 0 and spool.acked_seq == 2
+    assert accepted("base")["version"] == 2 and accepted("update-0")["version"] == 2
+
+def test_coalesced_update_resolves_to_the_update_written_in_its_place(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "write_behind", create_and_update(db, tmp_path, {"sentiment": "Negative"}, {"sentiment": "Neutral"}))
+    assert main.write_behind.stats["coalesced"] == 1
+    assert accepted("update-0") == {"accepted_id": "update-0", "status": "stored", "id": accepted("base")["id"], "version": 2}
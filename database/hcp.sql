@@ -23,6 +23,43 @@ SET time_zone = "+00:00";
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `hcps`
+--
+
+CREATE TABLE `hcps` (
+  `id` int(11) NOT NULL,
+  `name` varchar(255) NOT NULL,
+  `specialty` varchar(150) DEFAULT NULL,
+  `institution` varchar(255) DEFAULT NULL,
+  `city` varchar(120) DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Dumping data for table `hcps`
+--
+
+INSERT INTO `hcps` (`id`, `name`, `specialty`, `institution`, `city`, `created_at`, `updated_at`) VALUES
+(1, 'Dr. Evelyn Hayes', 'Oncology', 'City General Hospital', 'Boston', '2025-05-17 09:00:00', '2025-05-17 09:00:00'),
+(2, 'Dr. Marcus Smith', 'Pulmonology', 'St. Mary Medical Center', 'Chicago', '2025-05-17 09:00:00', '2025-05-17 09:00:00');
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `interaction_log_updates`
+--
+
+CREATE TABLE `interaction_log_updates` (
+  `idempotencyKey` varchar(64) NOT NULL,
+  `interaction_log_id` int(11) NOT NULL,
+  `version` int(11) NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `interaction_logs`
 --
@@ -39,6 +76,8 @@ CREATE TABLE `interaction_logs` (
   `outcomes` text DEFAULT NULL,
   `followUpActions` text DEFAULT NULL,
   `chatSessionId` varchar(255) DEFAULT NULL,
+  `idempotencyKey` varchar(64) DEFAULT NULL,
+  `version` int(11) NOT NULL DEFAULT 1,
   `created_at` timestamp NOT NULL DEFAULT current_timestamp()
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
@@ -92,6 +131,34 @@ INSERT INTO `interaction_products_discussed_ai` (`id`, `interaction_log_id`, `pr
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `interaction_rollups`
+--
+
+CREATE TABLE `interaction_rollups` (
+  `dimension` varchar(20) NOT NULL,
+  `dim_value` varchar(255) NOT NULL,
+  `week_start` date NOT NULL,
+  `sentiment` varchar(50) NOT NULL DEFAULT '',
+  `interaction_count` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Dumping data for table `interaction_rollups`
+--
+
+INSERT INTO `interaction_rollups` (`dimension`, `dim_value`, `week_start`, `sentiment`, `interaction_count`) VALUES
+('all', '', '2025-05-12', 'Positive', 1),
+('all', '', '2025-05-19', 'Neutral', 1),
+('all', '', '2025-05-19', 'Positive', 1),
+('hcp', 'Dr. Evelyn Hayes', '2025-05-12', 'Positive', 1),
+('hcp', 'Dr. Hayes', '2025-05-19', 'Neutral', 1),
+('hcp', 'Dr. Hayes', '2025-05-19', 'Positive', 1),
+('product', 'OncoBoost', '2025-05-12', 'Positive', 1),
+('product', 'PulmoClear', '2025-05-12', 'Positive', 1);
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `interaction_samples_distributed`
 --
@@ -109,15 +176,64 @@ CREATE TABLE `interaction_samples_distributed` (
 INSERT INTO `interaction_samples_distributed` (`id`, `interaction_log_id`, `sample_name`) VALUES
 (42, 43, 'OncoBoost');
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `products`
+--
+
+CREATE TABLE `products` (
+  `id` int(11) NOT NULL,
+  `name` varchar(255) NOT NULL,
+  `therapeutic_area` varchar(150) DEFAULT NULL,
+  `indications` text DEFAULT NULL,
+  `standard_dosage` text DEFAULT NULL,
+  `common_side_effects` text DEFAULT NULL,
+  `contraindications` text DEFAULT NULL,
+  `efficacy_summary` text DEFAULT NULL,
+  `mechanism_of_action` text DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Dumping data for table `products`
+--
+
+INSERT INTO `products` (`id`, `name`, `therapeutic_area`, `indications`, `standard_dosage`, `common_side_effects`, `contraindications`, `efficacy_summary`, `mechanism_of_action`, `created_at`, `updated_at`) VALUES
+(1, 'OncoBoost', 'Oncology', 'Refractory solid tumours after first-line therapy', '10mg orally once daily', 'Mild nausea, fatigue', 'Severe hepatic impairment', 'Phase III trial showed 75% response rate in the target population', 'Selective kinase inhibitor', '2025-05-17 09:00:00', '2025-05-17 09:00:00'),
+(2, 'PulmoClear', 'Respiratory', 'Moderate to severe COPD', 'One 250mcg inhalation twice daily', 'Dry mouth, headache', 'Known hypersensitivity to the active substance', 'Improved FEV1 by 120mL versus placebo at 12 weeks', 'Long-acting muscarinic antagonist', '2025-05-17 09:00:00', '2025-05-17 09:00:00');
+
 --
 -- Indexes for dumped tables
 --
 
+--
+-- Indexes for table `hcps`
+--
+ALTER TABLE `hcps`
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `idx_hcps_name` (`name`),
+  ADD KEY `idx_hcps_updated_at` (`updated_at`);
+
+--
+-- Indexes for table `interaction_log_updates`
+--
+ALTER TABLE `interaction_log_updates`
+  ADD PRIMARY KEY (`idempotencyKey`),
+  ADD KEY `interaction_log_id` (`interaction_log_id`);
+
 --
 -- Indexes for table `interaction_logs`
 --
 ALTER TABLE `interaction_logs`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_interaction_logs_idempotency_key` (`idempotencyKey`),
+  ADD KEY `idx_logs_date` (`interactionDate`,`id`),
+  ADD KEY `idx_logs_hcp_date` (`hcpName`,`interactionDate`,`id`),
+  ADD KEY `idx_logs_sentiment_date` (`sentiment`,`interactionDate`,`id`),
+  ADD KEY `idx_logs_type_date` (`interactionType`,`interactionDate`,`id`),
+  ADD FULLTEXT KEY `ft_logs_topics_outcomes` (`topicsDiscussed`,`outcomes`);
 
 --
 -- Indexes for table `interaction_materials_shared`
@@ -131,7 +247,15 @@ ALTER TABLE `interaction_materials_shared`
 --
 ALTER TABLE `interaction_products_discussed_ai`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `interaction_log_id` (`interaction_log_id`);
+  ADD KEY `interaction_log_id` (`interaction_log_id`),
+  ADD KEY `idx_products_discussed_name_log` (`product_name`,`interaction_log_id`);
+
+--
+-- Indexes for table `interaction_rollups`
+--
+ALTER TABLE `interaction_rollups`
+  ADD PRIMARY KEY (`dimension`,`dim_value`,`week_start`,`sentiment`),
+  ADD KEY `idx_rollups_dimension_week` (`dimension`,`week_start`);
 
 --
 -- Indexes for table `interaction_samples_distributed`
@@ -140,10 +264,24 @@ ALTER TABLE `interaction_samples_distributed`
   ADD PRIMARY KEY (`id`),
   ADD KEY `interaction_log_id` (`interaction_log_id`);
 
+--
+-- Indexes for table `products`
+--
+ALTER TABLE `products`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_products_name` (`name`),
+  ADD KEY `idx_products_updated_at` (`updated_at`);
+
 --
 -- AUTO_INCREMENT for dumped tables
 --
 
+--
+-- AUTO_INCREMENT for table `hcps`
+--
+ALTER TABLE `hcps`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=3;
+
 --
 -- AUTO_INCREMENT for table `interaction_logs`
 --
@@ -168,10 +306,22 @@ ALTER TABLE `interaction_products_discussed_ai`
 ALTER TABLE `interaction_samples_distributed`
   MODIFY `id` int(11) NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=43;
 
+--
+-- AUTO_INCREMENT for table `products`
+--
+ALTER TABLE `products`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=3;
+
 --
 -- Constraints for dumped tables
 --
 
+--
+-- Constraints for table `interaction_log_updates`
+--
+ALTER TABLE `interaction_log_updates`
+  ADD CONSTRAINT `interaction_log_updates_ibfk_1` FOREIGN KEY (`interaction_log_id`) REFERENCES `interaction_logs` (`id`) ON DELETE CASCADE;
+
 --
 -- Constraints for table `interaction_materials_shared`
 --
@@ -10,13 +10,15 @@ import {
   addMaterial,
   addSample,
   updateMaterialSearch,
-  resetForm
+  resetForm,
+  mapAiFieldsToFormUpdates,
+  AI_FIELD_KEY_MAP
 } from './features/interactionForm/interactionFormSlice'; 
 
 import {
   addChatMessage,
   updateChatInput,
-  sendMessageToAI,
+  streamMessageToAI,
   setChatSession, 
   clearChatMessages 
 } from './features/chat/chatSlice'; 
@@ -125,12 +127,13 @@ const App = () => {
           dispatch(setChatSession(currentChatSessionIdForSubmission)); 
         }
         
-        const resultAction = await dispatch(sendMessageToAI({ 
+        // Streams the reply and fills form fields as each one is extracted
+        const resultAction = await dispatch(streamMessageToAI({ 
           userMessage: userMessageText, 
           sessionId: currentChatSessionIdForSubmission 
         }));
 
-        if (sendMessageToAI.fulfilled.match(resultAction)) {
+        if (streamMessageToAI.fulfilled.match(resultAction)) {
             const payload = resultAction.payload;
             finalActionTypeFromAI = payload.final_action_type; 
 
@@ -138,53 +141,7 @@ const App = () => {
                 aiExtractedDataForCurrentTurn = payload.extracted_data;
                 console.log("AI Extracted Data (Raw from Backend):", aiExtractedDataForCurrentTurn);
 
-                // --- KEY MAPPING LOGIC ---
-                const updatesToForm = {};
-                const keyMap = {
-                    "hcp_name": "hcpName",
-                    "interaction_date": "date",
-                    "interaction_time": "time",
-                    "interaction_type": "interactionType",
-                    "key_topics": "topicsDiscussed", // Assuming your form uses topicsDiscussed
-                    "discussed_products": "productsDiscussed", // Assuming your form uses productsDiscussed
-                    "materials_shared": "materialsShared",
-                    "samples_distributed": "samplesDistributed",
-                    "next_steps": "followUpActions"
-                    // Add other mappings if AI uses different keys than your form state
-                };
-
-                for (const rawKey in aiExtractedDataForCurrentTurn) {
-                    const formKey = keyMap[rawKey] || rawKey; // Use mapped key or raw key if no map
-                    const value = aiExtractedDataForCurrentTurn[rawKey];
-
-                    if (value !== null && value !== undefined) {
-                      if (formKey === 'date') {
-                        if (value && typeof value === 'string' && value.toLowerCase() !== 'yyyy-mm-dd' && value.match(/^\d{4}-\d{2}-\d{2}$/)) {
-                          updatesToForm[formKey] = value;
-                        } else if (!value.match(/^\d{4}-\d{2}-\d{2}$/)) { // If format is wrong, don't update
-                            console.warn(`AI returned invalid date format for 'date': ${value}`);
-                        } else {
-                            updatesToForm[formKey] = value; // Assume correct format if not the placeholder
-                        }
-                      } else if (formKey === 'time') {
-                          if (value && typeof value === 'string' && value.match(/^\d{2}:\d{2}(:\d{2})?$/)) {
-                              updatesToForm[formKey] = value;
-                          } else {
-                              console.warn(`AI returned invalid time format for 'time': ${value}`);
-                          }
-                      } else if ((formKey === 'materialsShared' || formKey === 'samplesDistributed' || formKey === 'productsDiscussed') && Array.isArray(value)) {
-                        updatesToForm[formKey] = value; // Send array of strings to reducer
-                      } else if (Object.prototype.hasOwnProperty.call(currentFormDataFromStore, formKey)) {
-                        updatesToForm[formKey] = String(value);
-                      } else {
-                        // If key is not in form but we want to keep it (e.g. for finalPayload)
-                        // This part might not be needed if all relevant keys are in initialFormState
-                        console.log(`AI extracted unmapped key '${rawKey}' (mapped to '${formKey}') with value:`, value);
-                        // updatesToForm[formKey] = String(value); // Optionally add it if it's a new field
-                      }
-                    }
-                }
-                // --- END OF KEY MAPPING LOGIC ---
+                const updatesToForm = mapAiFieldsToFormUpdates(aiExtractedDataForCurrentTurn, currentFormDataFromStore);
 
                 if (Object.keys(updatesToForm).length > 0) {
                     console.log("Dispatching updateMultipleFormFields with mapped updates:", updatesToForm);
@@ -195,7 +152,7 @@ const App = () => {
                 dispatch(setChatSession(payload.session_id));
                 currentChatSessionIdForSubmission = payload.session_id;
             }
-        } else if (sendMessageToAI.rejected.match(resultAction)) {
+        } else if (streamMessageToAI.rejected.match(resultAction)) {
             alert(`Error: AI processing failed. ${resultAction.payload || ''}`);
             return; 
         }
@@ -224,14 +181,8 @@ const App = () => {
     if (aiExtractedDataForCurrentTurn) { 
         // Re-apply mapped data to ensure payloadForDb has the latest
         const mappedAiData = {};
-        const keyMap = { /* Same keyMap as above */
-            "hcp_name": "hcpName", "interaction_date": "date", "interaction_time": "time",
-            "interaction_type": "interactionType", "key_topics": "topicsDiscussed",
-            "discussed_products": "productsDiscussed", "materials_shared": "materialsShared",
-            "samples_distributed": "samplesDistributed", "next_steps": "followUpActions"
-        };
         for (const rawKey in aiExtractedDataForCurrentTurn) {
-            const formKey = keyMap[rawKey] || rawKey;
+            const formKey = AI_FIELD_KEY_MAP[rawKey] || rawKey;
             mappedAiData[formKey] = aiExtractedDataForCurrentTurn[rawKey];
         }
 
@@ -1,5 +1,6 @@
 // src/features/chat/chatSlice.js
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
+import { updateMultipleFormFields, mapAiFieldsToFormUpdates } from '../interactionForm/interactionFormSlice';
 
 const generateUniqueId = () => Date.now() + Math.random().toString(36).substr(2, 9);
 const CHAT_SESSION_ID_KEY = 'hcpChatSessionId'; // Key for sessionStorage
@@ -25,6 +26,7 @@ const initialState = {
   ],
   chatSessionId: getInitialSessionId(), // Load from sessionStorage
   isSending: false,
+  streamingMessageId: null, // ID of the AI message currently being streamed in
   error: null,
   aiChatInput: '',
 };
@@ -56,6 +58,83 @@ export const sendMessageToAI = createAsyncThunk(
   }
 );
 
+// Parses one Server-Sent Events block ("event: x\ndata: {...}") into { event, data }
+const parseSseEvent = (rawEvent) => {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of rawEvent.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+};
+
+// Streaming variant of sendMessageToAI: reply tokens are appended to the chat as they arrive and
+// each extracted field is applied to the form as soon as the backend has parsed it.
+// Resolves with the same payload shape as sendMessageToAI.
+export const streamMessageToAI = createAsyncThunk(
+  'chat/streamMessageToAI',
+  async ({ userMessage, sessionId }, { dispatch, getState, rejectWithValue }) => {
+    dispatch(startStreamingReply(generateUniqueId()));
+    try {
+      const response = await fetch('http://localhost:8000/interactions/log_chat_message/stream', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          user_message: userMessage,
+          session_id: sessionId,
+        }),
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({ detail: "Unknown API error" }));
+        return rejectWithValue(errorData.detail || response.statusText);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let finalPayload = null;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const { event, data } = parseSseEvent(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          if (event === 'token') {
+            dispatch(appendStreamingToken(data.text));
+          } else if (event === 'field') {
+            const updates = mapAiFieldsToFormUpdates({ [data.field]: data.value }, getState().interactionForm);
+            if (Object.keys(updates).length > 0) dispatch(updateMultipleFormFields(updates));
+          } else if (event === 'done') {
+            finalPayload = data;
+          } else if (event === 'error') {
+            return rejectWithValue(data.detail || "AI streaming error");
+          }
+        }
+      }
+      if (!finalPayload) return rejectWithValue("Stream ended before the AI finished responding.");
+      return finalPayload;
+    } catch (error) {
+      return rejectWithValue(error.message || "Network error");
+    }
+  }
+);
+
+const updateSessionFromPayload = (state, payload) => {
+  if (payload.session_id && payload.session_id !== state.chatSessionId) {
+    state.chatSessionId = payload.session_id;
+    try {
+      sessionStorage.setItem(CHAT_SESSION_ID_KEY, payload.session_id);
+    } catch (e) {
+      console.error("Could not access sessionStorage to save ID:", e);
+    }
+  }
+};
 
 export const chatSlice = createSlice({
   name: 'chat',
@@ -67,6 +146,14 @@ export const chatSlice = createSlice({
     updateChatInput: (state, action) => {
       state.aiChatInput = action.payload;
     },
+    startStreamingReply: (state, action) => {
+      state.streamingMessageId = action.payload;
+      state.messages.push({ id: action.payload, sender: 'system', text: '' });
+    },
+    appendStreamingToken: (state, action) => {
+      const message = state.messages.find(m => m.id === state.streamingMessageId);
+      if (message) message.text += action.payload;
+    },
     clearChatError: (state) => {
       state.error = null;
     },
@@ -112,15 +199,7 @@ export const chatSlice = createSlice({
           text: action.payload.ai_response,
         };
         state.messages.push(aiReply);
-        
-        if (action.payload.session_id && action.payload.session_id !== state.chatSessionId) {
-          state.chatSessionId = action.payload.session_id;
-          try {
-            sessionStorage.setItem(CHAT_SESSION_ID_KEY, action.payload.session_id);
-          } catch (e) {
-            console.error("Could not access sessionStorage to save ID:", e);
-          }
-        }
+        updateSessionFromPayload(state, action.payload);
       })
       .addCase(sendMessageToAI.rejected, (state, action) => {
         state.isSending = false;
@@ -131,6 +210,30 @@ export const chatSlice = createSlice({
             text: `Error: ${action.payload || 'Failed to get AI response.'}`
         };
         state.messages.push(errorMessage);
+      })
+      .addCase(streamMessageToAI.pending, (state) => {
+        state.isSending = true;
+        state.error = null;
+      })
+      .addCase(streamMessageToAI.fulfilled, (state, action) => {
+        state.isSending = false;
+        // Tool results replace the streamed conversational reply, so always settle on the final text
+        const message = state.messages.find(m => m.id === state.streamingMessageId);
+        if (message) message.text = action.payload.ai_response;
+        state.streamingMessageId = null;
+        updateSessionFromPayload(state, action.payload);
+      })
+      .addCase(streamMessageToAI.rejected, (state, action) => {
+        state.isSending = false;
+        state.error = action.payload;
+        const streamedText = state.messages.find(m => m.id === state.streamingMessageId)?.text;
+        if (!streamedText) state.messages = state.messages.filter(m => m.id !== state.streamingMessageId);
+        state.streamingMessageId = null;
+        state.messages.push({
+            id: generateUniqueId(),
+            sender: 'system',
+            text: `Error: ${action.payload || 'Failed to get AI response.'}`
+        });
       });
   },
 });
@@ -138,6 +241,8 @@ export const chatSlice = createSlice({
 // Ensure clearChatMessages is exported here
 export const { 
     addChatMessage, 
+    startStreamingReply,
+    appendStreamingToken,
     updateChatInput, 
     clearChatError, 
     setChatSession,
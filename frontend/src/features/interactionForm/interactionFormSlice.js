@@ -3,6 +3,51 @@ import { createSlice } from '@reduxjs/toolkit';
 
 const generateUniqueId = () => Date.now() + Math.random().toString(36).substr(2, 9);
 
+// Field names the AI sometimes uses instead of the form state keys
+export const AI_FIELD_KEY_MAP = {
+  "hcp_name": "hcpName",
+  "interaction_date": "date",
+  "interaction_time": "time",
+  "interaction_type": "interactionType",
+  "key_topics": "topicsDiscussed",
+  "discussed_products": "productsDiscussed",
+  "materials_shared": "materialsShared",
+  "samples_distributed": "samplesDistributed",
+  "next_steps": "followUpActions"
+};
+
+// Turns AI-extracted fields into validated updates for updateMultipleFormFields.
+// Used both for the final chat response and for fields streamed in one at a time.
+export const mapAiFieldsToFormUpdates = (extractedFields, formState) => {
+  const updatesToForm = {};
+  for (const rawKey in extractedFields) {
+    const formKey = AI_FIELD_KEY_MAP[rawKey] || rawKey;
+    const value = extractedFields[rawKey];
+    if (value === null || value === undefined) continue;
+
+    if (formKey === 'date') {
+      if (typeof value === 'string' && value.match(/^\d{4}-\d{2}-\d{2}$/)) {
+        updatesToForm[formKey] = value;
+      } else {
+        console.warn(`AI returned invalid date format for 'date': ${value}`);
+      }
+    } else if (formKey === 'time') {
+      if (typeof value === 'string' && value.match(/^\d{2}:\d{2}(:\d{2})?$/)) {
+        updatesToForm[formKey] = value;
+      } else {
+        console.warn(`AI returned invalid time format for 'time': ${value}`);
+      }
+    } else if ((formKey === 'materialsShared' || formKey === 'samplesDistributed' || formKey === 'productsDiscussed') && Array.isArray(value)) {
+      updatesToForm[formKey] = value; // Send array of strings to reducer
+    } else if (Object.prototype.hasOwnProperty.call(formState, formKey)) {
+      updatesToForm[formKey] = String(value);
+    } else {
+      console.log(`AI extracted unmapped key '${rawKey}' (mapped to '${formKey}') with value:`, value);
+    }
+  }
+  return updatesToForm;
+};
+
 const initialState = {
   currentLogDatabaseId: null, // <-- NEW: To store the ID of the currently active/saved log
   hcpName: '',